@@ -1,8 +1,10 @@
 from django.contrib import admin
 from .models import (
     Department, CustomUser, Employee, PaymentProfile, Attendance,
-    LeaveRequest, LeaveBalance, PayrollPeriod, Payroll
+    LeaveRequest, LeaveBalance, PayrollPeriod, Payroll, OutboxEmail, RevokedToken, TaskRun,
+    AttendanceArchive, ExportRun,
 )
+from django.utils import timezone
 
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
@@ -18,6 +20,38 @@ class EmployeeAdmin(admin.ModelAdmin):
 class PaymentProfileAdmin(admin.ModelAdmin):
     list_display = ("employee","base_salary","overtime_payment","last_updated")
 
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ("to","subject","status","attempts","next_attempt_at","sent_at")
+    list_filter = ("status",)
+    search_fields = ("to",)
+    actions = ["requeue"]
+
+    @admin.action(description="Requeue selected emails")
+    def requeue(self, request, queryset):
+        queryset.exclude(status="SENT").update(status="PENDING", attempts=0, lease_token="", next_attempt_at=timezone.now())
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ("jti","user_id","expires_at","revoked_at")
+    search_fields = ("jti",)
+
+@admin.register(TaskRun)
+class TaskRunAdmin(admin.ModelAdmin):
+    list_display = ("task_name","queue","status","started_at","wait_seconds","run_seconds","queries","rows")
+    list_filter = ("status","queue")
+    search_fields = ("task_name",)
+
+@admin.register(AttendanceArchive)
+class AttendanceArchiveAdmin(admin.ModelAdmin):
+    list_display = ("employee","month","row_count","archived_at")
+    exclude = ("data",)
+
+@admin.register(ExportRun)
+class ExportRunAdmin(admin.ModelAdmin):
+    list_display = ("table","since","until","rows","path","finished_at")
+    list_filter = ("table",)
+
 admin.site.register(Department)
 admin.site.register(Attendance)
 admin.site.register(LeaveRequest)
@@ -0,0 +1,96 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Avg, Count, Sum
+from .models import Department, Payroll, PayrollPeriod
+
+PERIOD_COSTS_KEY = "hrapp:analytics:period-costs:{}"
+MONEY_FIELDS = ("gross", "overtime_pay", "deductions", "net")
+# Summed from the typed PayrollLineItem columns
+TIME_FIELDS = ("paid_days", "unpaid_days", "overtime_hours")
+CENTS = Decimal("0.01")
+
+
+def _money(value):
+    return (value or Decimal("0")).quantize(CENTS)
+
+
+def _compute(period_ids):
+    costs = {pk: {} for pk in period_ids}
+    rows = (
+        Payroll.objects.filter(period_id__in=period_ids).order_by()
+        .values("period_id", "employee__department_id")
+        .annotate(
+            headcount=Count("id"), average_net=Avg("net"),
+            **{field: Sum(field) for field in MONEY_FIELDS},
+            **{field: Sum(f"line_item__{field}") for field in TIME_FIELDS},
+        )
+    )
+    for row in rows:
+        costs[row["period_id"]][row["employee__department_id"]] = {
+            "headcount": row["headcount"],
+            **{field: _money(row[field]) for field in MONEY_FIELDS},
+            "average_net": _money(row["average_net"]),
+            **{field: _money(row[field]) for field in TIME_FIELDS},
+        }
+    return costs
+
+
+def period_costs(periods):
+    # {period_id: {department_id: totals}}. A closed period's totals are cached until the
+    # period or one of its payrolls is saved again (see signals.invalidate_period_costs).
+    keys = {period.pk: PERIOD_COSTS_KEY.format(period.pk) for period in periods if period.is_closed}
+    found = cache.get_many(list(keys.values()))
+    costs = {pk: found[key] for pk, key in keys.items() if key in found}
+    missing = [period.pk for period in periods if period.pk not in costs]
+    if missing:
+        computed = _compute(missing)
+        cache.set_many({keys[pk]: computed[pk] for pk in missing if pk in keys}, None)
+        costs.update(computed)
+    return costs
+
+
+def evict_period_costs(period_id):
+    cache.delete(PERIOD_COSTS_KEY.format(period_id))
+
+
+def _totals(departments):
+    totals = {"headcount": sum(row["headcount"] for row in departments)}
+    totals.update({field: sum((row[field] for row in departments), Decimal("0.00")) for field in MONEY_FIELDS})
+    totals["average_net"] = _money(totals["net"] / totals["headcount"]) if totals["headcount"] else Decimal("0.00")
+    totals.update({field: sum((row[field] for row in departments), Decimal("0.00")) for field in TIME_FIELDS})
+    return totals
+
+
+def _entry(current, previous):
+    entry = {key: str(value) if isinstance(value, Decimal) else value for key, value in current.items()}
+    entry["change"] = None if previous is None else {
+        key: str(value - previous[key]) if isinstance(value, Decimal) else value - previous[key]
+        for key, value in current.items()
+    }
+    return entry
+
+
+def department_cost_report(periods):
+    # Cost per department for each period (ordered by start), each compared with the period
+    # that precedes it
+    periods = list(periods)
+    if not periods:
+        return []
+    chain = [PayrollPeriod.objects.filter(start__lt=periods[0].start).order_by("-start").first()] + periods
+    costs = period_costs([period for period in chain if period is not None])
+    names = dict(Department.objects.values_list("id", "name"))
+    report = []
+    for previous, period in zip(chain, periods):
+        current = costs[period.pk]
+        before = costs[previous.pk] if previous is not None else None
+        departments = []
+        for department_id in sorted(current, key=lambda pk: (pk is None, names.get(pk) or "")):
+            entry = _entry(current[department_id], before.get(department_id) if before is not None else None)
+            departments.append({"department_id": department_id, "department": names.get(department_id), **entry})
+        report.append({
+            "period": {"id": period.pk, "start": period.start.isoformat(), "end": period.end.isoformat(), "is_closed": period.is_closed},
+            "previous_period_id": previous.pk if previous is not None else None,
+            "departments": departments,
+            "totals": _entry(_totals(current.values()), _totals(before.values()) if before is not None else None),
+        })
+    return report
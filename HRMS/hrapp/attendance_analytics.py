@@ -0,0 +1,230 @@
+from datetime import datetime
+from itertools import islice
+import numpy as np
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Func, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Attendance, Department, Employee, get_work_hours
+
+STATUSES = [code for code, _ in Attendance.STATUS_CHOICES]
+NO_DEPARTMENT = -1
+LATE_GRACE_MINUTES = 15
+PERCENTILES = (50, 90, 99)
+
+
+class EpochSeconds(Func):
+    # Seconds since 1970-01-01 UTC computed by the database, so rows arrive as plain numbers
+    # instead of being parsed into datetime objects one at a time
+    template = "EXTRACT(EPOCH FROM %(expressions)s)"
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # julianday() arithmetic is off by a few microseconds; rounding to the millisecond keeps
+        # equal times equal, so e.g. a day of exactly the work hours has no overtime
+        return self.as_sql(
+            compiler, connection, template="ROUND((julianday(%(expressions)s) - 2440587.5) * 86400.0, 3)",
+            **extra_context,
+        )
+
+
+def _columns():
+    return {
+        "employee": F("employee_id"),
+        "department": Coalesce("employee__department_id", Value(NO_DEPARTMENT)),
+        "day": EpochSeconds("date"),
+        "check_in": EpochSeconds("check_in"),
+        "check_out": EpochSeconds("check_out"),
+        "status": Case(*(When(status=code, then=Value(i)) for i, code in enumerate(STATUSES)), default=Value(-1)),
+    }
+
+
+def load_attendance(start, end, department_id=None, chunk_size=20000):
+    # Column arrays for the attendance in [start, end]: timestamps as epoch seconds (NaN when
+    # missing), status as its index in STATUSES, department NO_DEPARTMENT when unassigned.
+    # Every chunk of numeric rows becomes one float array in a single call.
+    queryset = Attendance.objects.filter(date__range=(start, end)).order_by()
+    if department_id is not None:
+        queryset = queryset.filter(employee__department_id=department_id)
+    columns = _columns()
+    rows = queryset.values_list(*columns.values()).iterator(chunk_size=chunk_size)
+    parts = []
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        parts.append(np.array(chunk, dtype=np.float64))
+    table = np.concatenate(parts) if parts else np.empty((0, len(columns)))
+    data = dict(zip(columns, table.T))
+    data["employee"] = data["employee"].astype(np.int64)
+    data["department"] = data["department"].astype(np.int64)
+    data["status"] = data["status"].astype(np.int8)
+    data["day"] = np.rint(data["day"] / 86400).astype(np.int64).astype("datetime64[D]")
+    return data
+
+
+def _months(days):
+    return days.astype("datetime64[M]")
+
+
+def _groups(*keys):
+    # Group index of every row for the combination of integer key arrays, and the distinct key
+    # combinations in lexicographic order
+    if not keys[0].size:
+        return np.empty((0, len(keys)), dtype=np.int64), np.empty(0, dtype=np.int64)
+    distinct, inverse = np.unique(np.stack(keys, axis=1), axis=0, return_inverse=True)
+    return distinct, inverse.reshape(-1)
+
+
+def grouped_percentiles(group, values, groups, percentiles=PERCENTILES):
+    # Per-group percentiles with np.percentile's linear interpolation, from a single sort
+    sizes = np.bincount(group, minlength=groups)
+    result = {}
+    if not values.size:
+        return {p: np.full(groups, np.nan) for p in percentiles}
+    order = np.lexsort((values, group))
+    ordered = values[order]
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    for p in percentiles:
+        position = starts + np.maximum(sizes - 1, 0) * (p / 100)
+        low = np.minimum(np.floor(position).astype(np.int64), ordered.size - 1)
+        high = np.minimum(np.ceil(position).astype(np.int64), ordered.size - 1)
+        value = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+        result[p] = np.where(sizes > 0, value, np.nan)
+    return result
+
+
+def _department_names():
+    return dict(Department.objects.values_list("id", "name"))
+
+
+def _department(department_id, names):
+    department_id = int(department_id)
+    if department_id == NO_DEPARTMENT:
+        return {"department_id": None, "department": None}
+    return {"department_id": department_id, "department": names.get(department_id)}
+
+
+def _round(value, digits=2):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def overtime_distribution(start, end, department_id=None):
+    # Daily overtime per department and month: how many worked days had overtime, the total,
+    # and the p50/p90/p99 of the overtime on those days
+    data = load_attendance(start, end, department_id)
+    worked = ~np.isnan(data["check_in"]) & ~np.isnan(data["check_out"])
+    overtime = np.maximum((data["check_out"][worked] - data["check_in"][worked]) / 3600 - get_work_hours(), 0)
+    keys, group = _groups(data["department"][worked], _months(data["day"][worked]).astype(np.int64))
+    worked_days = np.bincount(group, minlength=len(keys))
+    has_overtime = overtime > 0
+    overtime_days = np.bincount(group, weights=has_overtime, minlength=len(keys))
+    totals = np.bincount(group, weights=overtime, minlength=len(keys))
+    percentiles = grouped_percentiles(group[has_overtime], overtime[has_overtime], len(keys))
+    names = _department_names()
+    return {"groups": [
+        {
+            **_department(department, names),
+            "month": str(np.datetime64(int(month), "M")),
+            "worked_days": int(worked_days[i]),
+            "overtime_days": int(overtime_days[i]),
+            "overtime_hours": _round(totals[i]),
+            **{f"p{p}": _round(percentiles[p][i]) for p in PERCENTILES},
+        }
+        for i, (department, month) in enumerate(keys)
+    ]}
+
+
+def lateness(start, end, department_id=None, min_rate=0.25, min_days=3):
+    # Employees who checked in after the start of the work day plus the grace period on at
+    # least min_rate of their days (and min_days days), worst first
+    data = load_attendance(start, end, department_id)
+    checked_in = ~np.isnan(data["check_in"])
+    employee, check_in = data["employee"][checked_in], data["check_in"][checked_in]
+    days, day_index = np.unique(data["day"][checked_in], return_inverse=True)
+    work_start = datetime.strptime(settings.COMPANY_CONFIG.get("work_hours", {}).get("start", "09:00"), "%H:%M").time()
+    tz = timezone.get_current_timezone()
+    # The on-time limit of each distinct day in the company's time zone, so DST is respected
+    deadlines = np.array(
+        [datetime.combine(day, work_start, tzinfo=tz).timestamp() for day in days.astype(object)], dtype=np.float64,
+    ) + LATE_GRACE_MINUTES * 60
+    late_minutes = (check_in - deadlines[day_index.reshape(-1)]) / 60 if days.size else np.empty(0)
+    late = late_minutes > 0
+    employees, index = np.unique(employee, return_inverse=True)
+    index = index.reshape(-1)
+    days_in = np.bincount(index, minlength=len(employees))
+    late_days = np.bincount(index, weights=late, minlength=len(employees))
+    late_total = np.bincount(index, weights=np.where(late, late_minutes, 0), minlength=len(employees))
+    rate = np.divide(late_days, days_in, out=np.zeros(len(employees)), where=days_in > 0)
+    chronic = np.flatnonzero((rate >= min_rate) & (late_days >= min_days))
+    chronic = chronic[np.lexsort((-late_days[chronic], -rate[chronic]))]
+    people = {
+        pk: (fullname, department)
+        for pk, fullname, department in Employee.objects.filter(pk__in=employees[chronic].tolist())
+        .values_list("id", "fullname", "department_id")
+    }
+    names = _department_names()
+    result = []
+    for i in chronic:
+        fullname, department = people.get(int(employees[i]), (None, None))
+        result.append({
+            "employee_id": int(employees[i]),
+            "fullname": fullname,
+            **_department(NO_DEPARTMENT if department is None else department, names),
+            "days": int(days_in[i]),
+            "late_days": int(late_days[i]),
+            "late_rate": round(float(rate[i]), 3),
+            "average_late_minutes": round(float(late_total[i] / late_days[i]), 1),
+        })
+    return {"employees": result}
+
+
+def _trend(keys, group, status, outer=None):
+    records = np.bincount(group, minlength=len(keys))
+    absent = np.bincount(group, weights=status == STATUSES.index("absent"), minlength=len(keys))
+    on_leave = np.bincount(group, weights=status == STATUSES.index("on_leave"), minlength=len(keys))
+    rate = np.divide(absent, records, out=np.zeros(len(keys)), where=records > 0)
+    # Change from the previous calendar month of the same group (keys are sorted)
+    month = keys[:, -1]
+    follows = np.zeros(len(keys), dtype=bool)
+    follows[1:] = month[1:] == month[:-1] + 1
+    if outer is not None:
+        follows[1:] &= outer[1:] == outer[:-1]
+    change = np.full(len(keys), np.nan)
+    change[1:] = rate[1:] - rate[:-1]
+    change[~follows] = np.nan
+    return records, absent, on_leave, rate, change
+
+
+def absence_trends(start, end, department_id=None):
+    # Absence and leave rates per month, per department and company-wide, with the change
+    # from the month before
+    data = load_attendance(start, end, department_id)
+    month = _months(data["day"]).astype(np.int64)
+    names = _department_names()
+    result = {}
+    for name, keys_arrays in (("departments", (data["department"], month)), ("overall", (month,))):
+        keys, group = _groups(*keys_arrays)
+        records, absent, on_leave, rate, change = _trend(
+            keys, group, data["status"], keys[:, 0] if name == "departments" else None,
+        )
+        result[name] = [
+            {
+                **(_department(keys[i, 0], names) if name == "departments" else {}),
+                "month": str(np.datetime64(int(keys[i, -1]), "M")),
+                "records": int(records[i]),
+                "absent": int(absent[i]),
+                "on_leave": int(on_leave[i]),
+                "absence_rate": round(float(rate[i]), 4),
+                "change": _round(change[i], 4),
+            }
+            for i in range(len(keys))
+        ]
+    return result
+
+
+REPORTS = {
+    "overtime": overtime_distribution,
+    "lateness": lateness,
+    "absence": absence_trends,
+}
@@ -1,15 +1,105 @@
+from collections import namedtuple
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from .cache import TTLCache
+from .models import CustomUser, Employee
+
+user_cache = TTLCache(maxsize=1024, ttl=60)
+
+# user_id -> EmployeeIdentity for the self-service paths. Evicted locally by the Employee
+# signals; other processes pick up changes when the entry expires.
+EmployeeIdentity = namedtuple("EmployeeIdentity", "employee_id department_id is_verified")
+NO_EMPLOYEE = EmployeeIdentity(None, None, False)
+employee_identities = TTLCache(maxsize=8192, ttl=300)
+
+
+def get_cached_user(user_id):
+    user = user_cache.get(user_id)
+    if user is None:
+        user = CustomUser.objects.filter(pk=user_id).first()
+        if user is not None:
+            user_cache.set(user_id, user)
+    return user
+
+
+def get_identity(user_id):
+    identity = employee_identities.get(user_id)
+    if identity is None:
+        row = Employee.objects.filter(user_id=user_id).values_list("id", "department_id", "is_verified").first()
+        identity = EmployeeIdentity(*row) if row else NO_EMPLOYEE
+        employee_identities.set(user_id, identity)
+    return identity
+
+
+def get_employee_id(user):
+    if isinstance(user, HRTokenUser):
+        return user.employee_id
+    return get_identity(user.pk).employee_id
+
+
+def add_identity_claims(token, user):
+    employee_identities.pop(user.pk)
+    token["role"] = user.role
+    token["employee_id"] = get_identity(user.pk).employee_id
+    return token
+
+
+class HRTokenUser(TokenUser):
+    # Built from access-token claims without a query. Anything that is not a claim is read
+    # from the full CustomUser, loaded on first use through a small TTL'd LRU cache.
+    @cached_property
+    def id(self):
+        return int(self.token[settings.SIMPLE_JWT["USER_ID_CLAIM"]])
+
+    @cached_property
+    def role(self):
+        return self.token.get("role")
+
+    @cached_property
+    def employee_id(self):
+        employee_id = self.token.get("employee_id")
+        return employee_id if employee_id is not None else get_identity(self.id).employee_id
+
+    @cached_property
+    def instance(self):
+        user = get_cached_user(self.id)
+        if user is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        return user
+
+    def __str__(self):
+        return f"TokenUser {self.id} ({self.role})"
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.instance, attr)
+
 
 class CookieJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
         header = self.get_header(request)
         raw_token = self.get_raw_token(header) if header else None
-        if raw_token is None:
-            raw_token = request.COOKIES.get('access_token')
+        if raw_token is not None:
+            validated_token = self.get_validated_token(raw_token)
+            return self.get_user(validated_token), validated_token
+        raw_token = request.COOKIES.get('access_token')
         if raw_token is None:
             return None
+        # A stale cookie must not break AllowAny endpoints such as login and refresh
         try:
             validated_token = self.get_validated_token(raw_token)
             return self.get_user(validated_token), validated_token
-        except Exception:
-            return None
\ No newline at end of file
+        except (InvalidToken, TokenError, AuthenticationFailed):
+            return None
+
+    def get_user(self, validated_token):
+        if settings.JWT_STATELESS_USER and "role" in validated_token:
+            return HRTokenUser(validated_token)
+        return super().get_user(validated_token)
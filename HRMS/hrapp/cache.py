@@ -0,0 +1,155 @@
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.cache import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+RESPONSE_CACHE = "responses"
+VERSION_KEY = "hrapp:version:{}"
+METRIC_KEY = "hrapp:metrics:{}:{}"
+ENDPOINTS = []
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def _incr(key, initial):
+    if not cache.add(key, initial, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, initial, None)
+
+
+def model_versions(models):
+    # A missing (or culled) version restarts from the clock, never from a value already used
+    # in a cache key.
+    keys = [VERSION_KEY.format(_label(model)) for model in models]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        found.update(cache.get_many(missing))
+    return tuple(found.get(key, 0) for key in keys)
+
+
+def bump_version(*models):
+    # Cached responses embed the versions of the models they were built from, so bumping a
+    # version makes every dependent entry unreachable; the stale entries simply expire.
+    for model in models:
+        _incr(VERSION_KEY.format(_label(model)), time.time_ns())
+
+
+def _record(endpoint, outcome):
+    _incr(METRIC_KEY.format(endpoint, outcome), 1)
+
+
+def cache_metrics():
+    keys = {(endpoint, outcome): METRIC_KEY.format(endpoint, outcome) for endpoint in ENDPOINTS for outcome in ("hits", "misses")}
+    found = cache.get_many(list(keys.values()))
+    metrics = {}
+    for endpoint in ENDPOINTS:
+        hits = found.get(keys[endpoint, "hits"], 0)
+        misses = found.get(keys[endpoint, "misses"], 0)
+        total = hits + misses
+        metrics[endpoint] = {"hits": hits, "misses": misses, "hit_ratio": round(hits / total, 4) if total else None}
+    return metrics
+
+
+def _response_key(endpoint, request, models, per, kwargs):
+    if per == "role":
+        scope = f"role:{getattr(request.user, 'role', None)}"
+    else:
+        scope = f"user:{request.user.pk}"
+    raw = "|".join([
+        endpoint, scope, request.get_full_path(), repr(sorted(kwargs.items())), repr(model_versions(models)),
+    ])
+    return "hrapp:response:" + hashlib.md5(raw.encode()).hexdigest()
+
+
+def cache_response(*models, per="user", timeout=None):
+    # Caches response.data of a GET handler. per="role" shares an entry between users of the
+    # same role and must only be used where the payload does not depend on the user.
+    def decorator(func):
+        endpoint = func.__qualname__
+        ENDPOINTS.append(endpoint)
+
+        @wraps(func)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method != "GET":
+                return func(view, request, *args, **kwargs)
+            responses = caches[RESPONSE_CACHE]
+            key = _response_key(endpoint, request, models, per, kwargs)
+            data = responses.get(key)
+            if data is not None:
+                _record(endpoint, "hits")
+                return Response(data)
+            _record(endpoint, "misses")
+            response = func(view, request, *args, **kwargs)
+            if isinstance(response, Response) and response.status_code == 200:
+                responses.set(key, response.data, timeout or settings.RESPONSE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_get(func):
+    # Answers If-None-Match with 304 using view.get_etag(), which must be cheap: it runs
+    # before the handler and therefore before any serialization.
+    @wraps(func)
+    def wrapper(view, request, *args, **kwargs):
+        if request.method != "GET":
+            return func(view, request, *args, **kwargs)
+        etag = view.get_etag(request, **kwargs)
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in if_none_match or "*" in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = func(view, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+        return response
+    return wrapper
+
+
+class TTLCache:
+    # Small in-process LRU with per-entry expiry
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,141 @@
+import asyncio
+from collections import defaultdict
+import itertools
+import threading
+from django.conf import settings
+from .models import Employee
+from .renderers import FastJSONRenderer
+
+_renderer = FastJSONRenderer()
+
+
+def _frame(event_id, kind, data):
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, kind.encode(), _renderer.render(data))
+
+
+# Sent in place of everything a subscriber had not read yet once its queue filled up; the
+# client should reload what it shows (e.g. /api/attendance/today/) and carry on
+RESET = _frame(0, "reset", {"detail": "Events were dropped; reload the current state."})
+
+
+class Subscription:
+    def __init__(self, loop, department_id, maxsize):
+        self.loop = loop
+        self.department_id = department_id
+        self.queue = asyncio.Queue(maxsize)
+
+    def wants(self, department_id):
+        return self.department_id is None or self.department_id == department_id
+
+    def put(self, frame):
+        # Runs on the subscriber's loop. A client that cannot keep up loses its backlog, not
+        # the server's memory.
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+
+def _deliver(subscriptions, frame):
+    for subscription in subscriptions:
+        subscription.put(frame)
+
+
+class EventBroker:
+    # In-process pub/sub between the model signals (any thread) and the SSE streams (coroutines
+    # on the server's event loop). Only this process's writes are seen; run one ASGI process,
+    # or swap this for a shared broker, when writes are spread over several.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._ids = itertools.count(1)
+
+    def __bool__(self):
+        return bool(self._subscriptions)
+
+    def subscribe(self, department_id=None):
+        subscription = Subscription(asyncio.get_running_loop(), department_id, settings.EVENT_STREAM_QUEUE_SIZE)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, kind, data, department_id=None):
+        # The frame is encoded once and handed to each event loop in a single callback
+        frame = _frame(next(self._ids), kind, data)
+        by_loop = defaultdict(list)
+        with self._lock:
+            for subscription in self._subscriptions:
+                if subscription.wants(department_id):
+                    by_loop[subscription.loop].append(subscription)
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, subscriptions, frame)
+            except RuntimeError:
+                # The loop has closed; its streams are gone
+                for subscription in subscriptions:
+                    self.unsubscribe(subscription)
+
+
+event_broker = EventBroker()
+
+
+def _employee(employee_id):
+    return Employee.objects.filter(pk=employee_id).values_list("department_id", "fullname").first() or (None, None)
+
+
+def publish_attendance(attendance, deleted=False):
+    if not event_broker:
+        return
+    department_id, fullname = _employee(attendance.employee_id)
+    if deleted:
+        kind = "attendance_deleted"
+    else:
+        kind = "check_out" if attendance.check_out else "check_in" if attendance.check_in else "attendance"
+    event_broker.publish(kind, {
+        "attendance_id": attendance.pk, "employee_id": attendance.employee_id, "fullname": fullname,
+        "department_id": department_id, "date": attendance.date, "check_in": attendance.check_in,
+        "check_out": attendance.check_out, "status": attendance.status,
+    }, department_id)
+
+
+def publish_leave(leave, deleted=False):
+    if not event_broker:
+        return
+    department_id, fullname = _employee(leave.employee_id)
+    event_broker.publish("leave_status", {
+        "leave_id": leave.pk, "employee_id": leave.employee_id, "fullname": fullname,
+        "department_id": department_id, "type": leave.type, "start_date": leave.start_date,
+        "end_date": leave.end_date, "status": "DELETED" if deleted else leave.status,
+    }, department_id)
+
+
+class EventStream:
+    # SSE frames for one client. Subscribes on first iteration, i.e. on the server's event loop
+    # even when the view itself ran through sync middleware, and unsubscribes when Django closes
+    # the response, which it also does after a client disconnect. A comment line every
+    # EVENT_STREAM_HEARTBEAT_SECONDS keeps proxies from closing an idle stream.
+    def __init__(self, department_id=None):
+        self.department_id = department_id
+        self.subscription = None
+
+    async def __aiter__(self):
+        self.subscription = event_broker.subscribe(self.department_id)
+        try:
+            yield b"retry: %d\n\n" % settings.EVENT_STREAM_RETRY_MS
+            while True:
+                try:
+                    yield await asyncio.wait_for(self.subscription.queue.get(), settings.EVENT_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            self.close()
+
+    def close(self):
+        if self.subscription is not None:
+            event_broker.unsubscribe(self.subscription)
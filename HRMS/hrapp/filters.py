@@ -0,0 +1,42 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+def _date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Invalid date format. Use YYYY-MM-DD."})
+    return parsed
+
+
+def date_range(params):
+    return _date_param(params, "from"), _date_param(params, "to")
+
+
+class ListFilter(BaseFilterBackend):
+    # ?from=&to= on the view's date_filter_field plus exact matches on filter_fields
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        date_field = getattr(view, "date_filter_field", None)
+        if date_field:
+            start, end = date_range(params)
+            if start:
+                queryset = queryset.filter(**{f"{date_field}__gte": start})
+            if end:
+                queryset = queryset.filter(**{f"{date_field}__lte": end})
+        for name in getattr(view, "filter_fields", ()):
+            value = params.get(name)
+            if value:
+                try:
+                    queryset = queryset.filter(**{name: value})
+                except (ValueError, DjangoValidationError):
+                    raise ValidationError({name: "Invalid value."})
+        return queryset
@@ -0,0 +1,113 @@
+from contextlib import contextmanager
+from datetime import timedelta
+import threading
+import time
+import traceback
+from background_task.models import CompletedTask, Task
+from background_task.settings import app_settings
+from background_task.signals import task_error
+from django.db import connection
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import TaskRun
+from .retention import purge
+
+_current = threading.local()
+
+
+def _run():
+    return getattr(_current, "run", None)
+
+
+def record_rows(count):
+    # Called from inside a task to report how many rows it processed
+    run = _run()
+    if run is not None:
+        run["rows"] = (run["rows"] or 0) + count
+
+
+def mark_skipped():
+    run = _run()
+    if run is not None:
+        run["status"] = "SKIPPED"
+
+
+@receiver(task_error)
+def _record_task_error(sender, task, **kwargs):
+    # django-background-tasks catches the exception itself, so the failure is picked up from
+    # its signal while the exception is still being handled
+    run = _run()
+    if run is not None and run["task_id"] == task.pk:
+        run["status"] = "ERROR"
+        run["error"] = traceback.format_exc()[-4000:]
+
+
+@contextmanager
+def instrument(task, worker=""):
+    started_at = timezone.now()
+    run = {"task_id": task.pk, "status": "SUCCESS", "rows": None, "error": ""}
+    queries = [0]
+
+    def count_queries(execute, sql, params, many, context):
+        queries[0] += 1
+        return execute(sql, params, many, context)
+
+    _current.run = run
+    started = time.perf_counter()
+    try:
+        with connection.execute_wrapper(count_queries):
+            yield run
+    except Exception:
+        run["status"] = "ERROR"
+        run["error"] = traceback.format_exc()[-4000:]
+        raise
+    finally:
+        _current.run = None
+        TaskRun.objects.create(
+            task_id=task.pk, task_name=task.task_name, queue=task.queue or "", worker=worker,
+            status=run["status"], scheduled_for=task.run_at, started_at=started_at,
+            wait_seconds=max(0.0, (started_at - task.run_at).total_seconds()),
+            run_seconds=round(time.perf_counter() - started, 6), queries=queries[0],
+            rows=run["rows"], error=run["error"],
+        )
+
+
+def queue_metrics(hours=24):
+    now = timezone.now()
+    since = now - timedelta(hours=hours)
+    lease_expired = now - timedelta(seconds=app_settings.BACKGROUND_TASK_MAX_RUN_TIME)
+    running = Q(locked_by__isnull=False, locked_at__gte=lease_expired)
+    ready = ~running & Q(run_at__lte=now, failed_at=None)
+
+    queues = {}
+    for row in Task.objects.values("queue").annotate(
+        ready=Count("id", filter=ready), running=Count("id", filter=running),
+        scheduled=Count("id", filter=Q(run_at__gt=now)), oldest_ready=Min("run_at", filter=ready),
+    ).order_by("queue"):
+        queues[row["queue"] or "default"] = {
+            "ready": row["ready"],
+            "running": row["running"],
+            "scheduled": row["scheduled"],
+            "oldest_ready_age_seconds": round((now - row["oldest_ready"]).total_seconds(), 3) if row["oldest_ready"] else None,
+            "failed": 0,
+        }
+    for row in CompletedTask.objects.failed(within=timedelta(hours=hours)).values("queue").annotate(failed=Count("id")):
+        queues.setdefault(row["queue"] or "default", {
+            "ready": 0, "running": 0, "scheduled": 0, "oldest_ready_age_seconds": None, "failed": 0,
+        })["failed"] = row["failed"]
+
+    tasks = {
+        row.pop("task_name"): {key: round(value, 6) if isinstance(value, float) else value for key, value in row.items()}
+        for row in TaskRun.objects.filter(started_at__gte=since).values("task_name").annotate(
+            runs=Count("id"), errors=Count("id", filter=Q(status="ERROR")), skipped=Count("id", filter=Q(status="SKIPPED")),
+            avg_wait_seconds=Avg("wait_seconds"), max_wait_seconds=Max("wait_seconds"),
+            avg_run_seconds=Avg("run_seconds"), max_run_seconds=Max("run_seconds"),
+            avg_queries=Avg("queries"), rows=Sum("rows"), last_started_at=Max("started_at"),
+        ).order_by("task_name")
+    }
+    return {"window_hours": hours, "queues": queues, "tasks": tasks}
+
+
+def prune_runs(days, batch_size=None):
+    return purge(TaskRun.objects.filter(started_at__lt=timezone.now() - timedelta(days=days)), batch_size)
@@ -0,0 +1,31 @@
+from datetime import timedelta
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from hrapp.attendance_analytics import REPORTS
+
+
+class Command(BaseCommand):
+    help = "Print the overtime, lateness or absence analytics as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("report", choices=sorted(REPORTS))
+        parser.add_argument("--from", dest="start", help="YYYY-MM-DD, default 365 days before --to")
+        parser.add_argument("--to", dest="end", help="YYYY-MM-DD, default today")
+        parser.add_argument("--department", type=int, default=None)
+        parser.add_argument("--min-rate", type=float, default=0.25, help="lateness: share of days late")
+        parser.add_argument("--min-days", type=int, default=3, help="lateness: minimum late days")
+
+    def _date(self, value, name):
+        parsed = parse_date(value) if value else None
+        if value and parsed is None:
+            raise CommandError(f"--{name} must be YYYY-MM-DD")
+        return parsed
+
+    def handle(self, *args, **options):
+        end = self._date(options["end"], "to") or timezone.localdate()
+        start = self._date(options["start"], "from") or end - timedelta(days=365)
+        extra = {"min_rate": options["min_rate"], "min_days": options["min_days"]} if options["report"] == "lateness" else {}
+        result = REPORTS[options["report"]](start, end, options["department"], **extra)
+        self.stdout.write(json.dumps({"from": start.isoformat(), "to": end.isoformat(), **result}, indent=2))
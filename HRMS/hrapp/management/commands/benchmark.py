@@ -0,0 +1,391 @@
+import csv
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+import io
+import json
+import math
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time as clock
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from hrapp import warehouse
+from hrapp.attendance_analytics import LATE_GRACE_MINUTES, absence_trends, lateness, overtime_distribution
+from hrapp.models import (
+    Attendance, CustomUser, Department, Employee, LeaveRequest, Payroll, PayrollPeriod, get_current_date, get_work_hours,
+)
+from hrapp.parsers import FastJSONParser
+from hrapp.read_serializers import attendance_encoder, payroll_encoder
+from hrapp.renderers import FastJSONRenderer, orjson
+from hrapp.serializers import AttendanceSerializer, PayrollSerializer
+from hrapp.snapshot import today_snapshot
+
+
+def seed_employees(count):
+    department = Department.objects.first() or Department.objects.create(name="BENCH")
+    users = CustomUser.objects.bulk_create(
+        CustomUser(email=f"bench{i}@bench.local", password="!", role="employee", is_active=True)
+        for i in range(count)
+    )
+    return Employee.objects.bulk_create(
+        Employee(user=user, fullname=f"Bench Employee {i}", department=department, designation="Engineer")
+        for i, user in enumerate(users)
+    )
+
+
+def seed_attendance(employees, days, start=date(2024, 1, 1), batch_size=5000):
+    rng = random.Random(42)
+    tz = timezone.get_current_timezone()
+    rows = []
+    for day in (start + timedelta(days=i) for i in range(days)):
+        for emp in employees:
+            check_in = datetime.combine(day, time(8, 30), tzinfo=tz) + timedelta(minutes=rng.randint(0, 90))
+            rows.append(Attendance(
+                employee=emp, date=day, check_in=check_in,
+                check_out=check_in + timedelta(minutes=rng.randint(360, 660)),
+                status=rng.choice(("present", "present", "present", "late")),
+            ))
+    Attendance.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def seed_payroll(employees, periods, batch_size=5000):
+    period_rows = PayrollPeriod.objects.bulk_create(
+        PayrollPeriod(start=date(2000 + i // 12, i % 12 + 1, 1), end=date(2000 + i // 12, i % 12 + 1, 28))
+        for i in range(periods)
+    )
+    rows = [
+        Payroll(
+            employee=emp, period=period, gross=Decimal("52345.67"), overtime_pay=Decimal("1500.00"),
+            deductions=Decimal("1200.50"), net=Decimal("51145.17"),
+            line_items={"daily_rate": "2379.35", "paid_days": 21.0, "unpaid_days": 1.0,
+                        "overtime_hours": 3.0, "base_salary": "52345.67"},
+        )
+        for period in period_rows for emp in employees
+    ]
+    Payroll.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def seed_leaves(employees, per_employee, start=date(2024, 1, 1)):
+    rows = [
+        LeaveRequest(employee=emp, type="CASUAL", start_date=start + timedelta(days=3 * i),
+                     end_date=start + timedelta(days=3 * i + 1), reason="Benchmark leave")
+        for emp in employees for i in range(per_employee)
+    ]
+    LeaveRequest.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = clock.perf_counter()
+        result = fn()
+        timings.append(clock.perf_counter() - started)
+    return min(timings), result
+
+
+def bench_serializers(command, options):
+    rows = options["rows"]
+    employees = seed_employees(max(1, rows // 250))
+    per_employee = math.ceil(rows / len(employees))
+    seed_attendance(employees, per_employee)
+    seed_payroll(employees, per_employee)
+
+    renderer = JSONRenderer()
+    cases = [
+        ("attendance", Attendance.objects.select_related("employee", "employee__user"), AttendanceSerializer, attendance_encoder),
+        ("payroll", Payroll.objects.select_related("employee", "employee__user", "period"), PayrollSerializer, payroll_encoder),
+    ]
+    for name, queryset, serializer_class, encoder in cases:
+        count = queryset.count()
+        slow, slow_body = best_of(options["repeat"], lambda: renderer.render(serializer_class(queryset.all(), many=True).data))
+        fast, fast_body = best_of(options["repeat"], lambda: renderer.render(encoder.encode(queryset.all())))
+        command.stdout.write(
+            f"{name:<12} rows={count:<8} serializer={count / slow:>10.0f} rows/s  "
+            f"encoder={count / fast:>10.0f} rows/s  speedup={slow / fast:.1f}x  identical={slow_body == fast_body}"
+        )
+
+
+def bench_json(command, options):
+    rows = options["rows"]
+    employees = seed_employees(max(1, rows // 250))
+    per_employee = math.ceil(rows / len(employees))
+    seed_attendance(employees, per_employee)
+    seed_payroll(employees, per_employee)
+    seed_leaves(employees, max(1, per_employee // 10))
+    hr = CustomUser.objects.create(email="bench-hr@bench.local", password="!", role="hr", is_active=True)
+    client = APIClient()
+    client.force_authenticate(hr)
+
+    command.stdout.write(f"orjson available: {orjson is not None}")
+    payloads = [
+        (url, client.get(url).data)
+        for url in ("/api/attendance/", "/api/leaves/", "/api/payrolls/", "/api/employees/", "/api/payment-profiles/")
+    ]
+    payloads.append(("payroll values() (native Decimal/datetime)", list(Payroll.objects.values())))
+
+    stock, fast = JSONRenderer(), FastJSONRenderer()
+    for name, data in payloads:
+        slow, slow_body = best_of(options["repeat"], lambda: stock.render(data))
+        quick, fast_body = best_of(options["repeat"], lambda: fast.render(data))
+        command.stdout.write(
+            f"render {name:<45} {len(slow_body) / 1e6:>7.2f} MB  JSONRenderer={slow * 1000:>8.1f} ms  "
+            f"FastJSONRenderer={quick * 1000:>8.1f} ms  speedup={slow / quick:.1f}x  identical={slow_body == fast_body}"
+        )
+        slow, _ = best_of(options["repeat"], lambda: JSONParser().parse(io.BytesIO(slow_body)))
+        quick, _ = best_of(options["repeat"], lambda: FastJSONParser().parse(io.BytesIO(slow_body)))
+        command.stdout.write(
+            f"parse  {name:<45} {'':>10}  JSONParser={slow * 1000:>10.1f} ms  "
+            f"FastJSONParser={quick * 1000:>10.1f} ms  speedup={slow / quick:.1f}x"
+        )
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY, employee_id INTEGER NOT NULL, date TEXT NOT NULL,
+    check_in TEXT, check_out TEXT, status TEXT, UNIQUE (employee_id, date)
+);
+CREATE INDEX attendance_date_status ON attendance (date, status);
+"""
+
+
+def _sqlite_workload(path, pragmas, begin, threads, seconds, employees):
+    # Half the threads do check-in/check-out style read-then-write transactions, the other
+    # half run the attendance list aggregate. Returns throughput, lock errors and latency.
+    stop = clock.perf_counter() + seconds
+    results = {"writes": 0, "reads": 0, "locked": 0, "latencies": []}
+    lock = threading.Lock()
+
+    def connect():
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        for name, value in pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def writer(seed):
+        conn, rng = connect(), random.Random(seed)
+        writes, locked, latencies = 0, 0, []
+        while clock.perf_counter() < stop:
+            employee_id, day = rng.randrange(employees), f"2030-01-{rng.randint(1, 28):02d}"
+            started = clock.perf_counter()
+            try:
+                conn.execute(begin)
+                row = conn.execute("SELECT id FROM attendance WHERE employee_id = ? AND date = ?", (employee_id, day)).fetchone()
+                if row:
+                    conn.execute("UPDATE attendance SET check_out = datetime('now') WHERE id = ?", row)
+                else:
+                    conn.execute(
+                        "INSERT INTO attendance (employee_id, date, check_in, status) VALUES (?, ?, datetime('now'), 'present')",
+                        (employee_id, day),
+                    )
+                conn.execute("COMMIT")
+                writes += 1
+                latencies.append(clock.perf_counter() - started)
+            except sqlite3.OperationalError as exc:
+                if "locked" not in str(exc) and "busy" not in str(exc):
+                    raise
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                locked += 1
+        conn.close()
+        with lock:
+            results["writes"] += writes
+            results["locked"] += locked
+            results["latencies"] += latencies
+
+    def reader(seed):
+        conn, rng = connect(), random.Random(seed)
+        reads = 0
+        while clock.perf_counter() < stop:
+            try:
+                conn.execute(
+                    "SELECT status, COUNT(*) FROM attendance WHERE date = ? GROUP BY status",
+                    (f"2030-01-{rng.randint(1, 28):02d}",),
+                ).fetchall()
+                reads += 1
+            except sqlite3.OperationalError:
+                with lock:
+                    results["locked"] += 1
+        conn.close()
+        with lock:
+            results["reads"] += reads
+
+    workers = [threading.Thread(target=writer if i % 2 == 0 else reader, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    latencies = sorted(results.pop("latencies"))
+    results["p95_ms"] = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None
+    return results
+
+
+def bench_concurrency(command, options):
+    # Runs on scratch database files, not on the project database
+    configs = [
+        ("default (rollback journal, deferred)", {}, "BEGIN"),
+        ("tuned (SQLITE_PRAGMAS, immediate)", settings.SQLITE_PRAGMAS, "BEGIN IMMEDIATE"),
+    ]
+    employees = max(1, options["rows"] // 20)
+    for name, pragmas, begin in configs:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.sqlite3")
+            conn = sqlite3.connect(path)
+            conn.executescript(SQLITE_SCHEMA)
+            conn.executemany(
+                "INSERT INTO attendance (employee_id, date, check_in, status) VALUES (?, ?, '2024-01-01 09:00', 'present')",
+                ((i % employees, f"2024-{i // employees % 12 + 1:02d}-{i // employees // 12 % 28 + 1:02d}") for i in range(options["rows"])),
+            )
+            conn.commit()
+            conn.close()
+            result = _sqlite_workload(path, pragmas, begin, options["threads"], options["seconds"], employees)
+        p95 = f"{result['p95_ms']:.1f} ms" if result["p95_ms"] is not None else "-"
+        command.stdout.write(
+            f"{name:<40} writes/s={result['writes'] / options['seconds']:>8.0f}  reads/s={result['reads'] / options['seconds']:>8.0f}  "
+            f"locked={result['locked']:<6} write p95={p95}"
+        )
+
+
+def _python_attendance_reports(start, end):
+    # The same statistics from a loop over model instances, as a baseline
+    work_hours = get_work_hours()
+    work_start = datetime.strptime(settings.COMPANY_CONFIG.get("work_hours", {}).get("start", "09:00"), "%H:%M")
+    late_after = (work_start + timedelta(minutes=LATE_GRACE_MINUTES)).time()
+    overtime, late, absence = {}, {}, {}
+    for att in Attendance.objects.filter(date__range=(start, end)).select_related("employee"):
+        key = (att.employee.department_id, att.date.strftime("%Y-%m"))
+        counts = absence.setdefault(key, [0, 0])
+        counts[0] += 1
+        counts[1] += att.status == "absent"
+        if att.check_in:
+            days = late.setdefault(att.employee_id, [0, 0])
+            days[0] += 1
+            days[1] += timezone.localtime(att.check_in).time() > late_after
+        if att.check_in and att.check_out:
+            hours = (att.check_out - att.check_in).total_seconds() / 3600 - work_hours
+            if hours > 0:
+                overtime.setdefault(key, []).append(hours)
+    percentiles = {
+        key: statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else [values[0]] * 99
+        for key, values in overtime.items()
+    }
+    return percentiles, late, absence
+
+
+def bench_attendance_analytics(command, options):
+    # A year of attendance for rows // 365 employees spread over five departments
+    employees = seed_employees(max(1, options["rows"] // 365))
+    departments = [Department.objects.create(name=f"BENCH {i}") for i in range(5)]
+    for i, department in enumerate(departments):
+        Employee.objects.filter(pk__in=[emp.pk for emp in employees[i::5]]).update(department=department)
+    start = date(2024, 1, 1)
+    end = start + timedelta(days=364)
+    seed_attendance(employees, 365, start)
+    rng = random.Random(7)
+    ids = list(Attendance.objects.filter(employee__in=employees).values_list("id", flat=True))
+    Attendance.objects.filter(id__in=rng.sample(ids, len(ids) // 20)).update(status="absent", check_in=None, check_out=None)
+
+    slow, (percentiles, late, absence) = best_of(options["repeat"], lambda: _python_attendance_reports(start, end))
+    fast, (groups, chronic, trends) = best_of(options["repeat"], lambda: (
+        overtime_distribution(start, end), lateness(start, end), absence_trends(start, end),
+    ))
+    identical = all(
+        abs(group[f"p{p}"] - round(percentiles[group["department_id"], group["month"]][p - 1], 2)) < 0.011
+        for group in groups["groups"] if group["overtime_days"] for p in (50, 90, 99)
+    ) and all(
+        (row["records"], row["absent"]) == tuple(absence[row["department_id"], row["month"]])
+        for row in trends["departments"]
+    )
+    command.stdout.write(
+        f"attendance rows={len(ids):<8} python loop={slow * 1000:>9.1f} ms  numpy={fast * 1000:>8.1f} ms  "
+        f"speedup={slow / fast:.1f}x  same results={identical}  chronic late={len(chronic['employees'])}"
+    )
+
+
+def _body(response):
+    return b"".join(response.streaming_content) if response.streaming else response.content
+
+
+def bench_warehouse(command, options):
+    # The attendance table through the CSV and NDJSON exports and the Parquet warehouse export:
+    # download time and size, then the time for a consumer to load it
+    rows = options["rows"]
+    employees = seed_employees(max(1, rows // 250))
+    seed_attendance(employees, math.ceil(rows / len(employees)))
+    hr = CustomUser.objects.create(email="bench-hr@bench.local", password="!", role="hr", is_active=True)
+    client = APIClient()
+    client.force_authenticate(hr)
+    if warehouse.pa is None:
+        command.stdout.write("pyarrow is not installed")
+        return
+    loaders = {
+        "csv": lambda body: list(csv.reader(io.StringIO(body.decode()))),
+        "ndjson": lambda body: [json.loads(line) for line in body.splitlines()],
+        "parquet": lambda body: warehouse.pq.read_table(io.BytesIO(body)),
+    }
+    urls = {
+        "csv": "/api/attendance/export/?format=csv",
+        "ndjson": "/api/attendance/export/?format=ndjson",
+        "parquet": "/api/warehouse/attendance/",
+    }
+    count = Attendance.objects.count()
+    for name, url in urls.items():
+        export, body = best_of(options["repeat"], lambda: _body(client.get(url)))
+        load, _ = best_of(options["repeat"], lambda: loaders[name](body))
+        command.stdout.write(
+            f"{name:<8} rows={count:<8} size={len(body) / 1e6:>7.2f} MB  "
+            f"export={export * 1000:>8.1f} ms  load={load * 1000:>8.1f} ms"
+        )
+
+
+def bench_today(command, options):
+    # The "today" snapshot for rows employees: a full load, a poll served from memory and a
+    # check-in applied incrementally
+    employees = seed_employees(options["rows"])
+    seed_attendance(employees[: len(employees) // 2], 1, get_current_date())
+    today_snapshot.invalidate()
+    load, _ = best_of(options["repeat"], lambda: (today_snapshot.invalidate(), today_snapshot.get()))
+    poll, totals = best_of(options["repeat"], lambda: today_snapshot.get()["totals"])
+    attendance = Attendance(employee=employees[-1], date=get_current_date(), check_in=timezone.now(), status="present")
+    update, _ = best_of(options["repeat"], lambda: (today_snapshot.attendance_changed(attendance), today_snapshot.get()))
+    command.stdout.write(
+        f"employees={totals['headcount']:<8} load={load * 1000:>8.1f} ms  poll={poll * 1e6:>8.1f} us  "
+        f"check-in + poll={update * 1000:>8.1f} ms"
+    )
+
+
+BENCHMARKS = {
+    "attendance_analytics": bench_attendance_analytics,
+    "concurrency": bench_concurrency,
+    "json": bench_json,
+    "serializers": bench_serializers,
+    "today": bench_today,
+    "warehouse": bench_warehouse,
+}
+
+
+class Command(BaseCommand):
+    help = "Run a benchmark against synthetic data. All rows are rolled back afterwards."
+
+    def add_arguments(self, parser):
+        parser.add_argument("target", choices=sorted(BENCHMARKS))
+        parser.add_argument("--rows", type=int, default=20000)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            BENCHMARKS[options["target"]](self, options)
+            transaction.set_rollback(True)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from hrapp.outbox import deliver_all
+
+
+class Command(BaseCommand):
+    help = "Deliver every due email in the outbox now."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        sent, failed = deliver_all(options["batch_size"])
+        self.stdout.write(f"{sent} sent, {failed} failed")
@@ -0,0 +1,24 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from hrapp.warehouse import TABLES, export
+
+
+class Command(BaseCommand):
+    help = "Write Parquet snapshots of attendance, leave requests and payroll, partitioned by month."
+
+    def add_arguments(self, parser):
+        parser.add_argument("tables", nargs="*", help=f"Any of {', '.join(sorted(TABLES))}; default: all.")
+        parser.add_argument("--incremental", action="store_true", help="Only rows updated since the last export.")
+        parser.add_argument("--output", help="Default: WAREHOUSE_EXPORT_DIR.")
+        parser.add_argument("--chunk-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        unknown = set(options["tables"]) - set(TABLES)
+        if unknown:
+            raise CommandError(f"Unknown tables: {', '.join(sorted(unknown))}")
+        for name in options["tables"] or sorted(TABLES):
+            try:
+                run = export(name, options["output"], options["incremental"], options["chunk_size"])
+            except ImproperlyConfigured as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(f"{name}: {run.rows} rows -> {run.path}")
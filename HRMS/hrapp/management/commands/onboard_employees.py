@@ -0,0 +1,27 @@
+import csv
+import json
+from django.core.management.base import BaseCommand, CommandError
+from hrapp.serializers import BulkOnboardSerializer
+from hrapp.services import bulk_onboard_employees
+
+
+class Command(BaseCommand):
+    help = "Onboard employees in bulk from a CSV (header row) or JSON list file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        with open(path, newline="", encoding="utf-8") as fp:
+            if path.endswith(".json"):
+                rows = json.load(fp)
+            else:
+                rows = [{key: value for key, value in row.items() if value != ""} for row in csv.DictReader(fp)]
+
+        ser = BulkOnboardSerializer(data={"employees": rows})
+        if not ser.is_valid():
+            raise CommandError(json.dumps(ser.errors, indent=2, default=str))
+        employees = bulk_onboard_employees(ser.validated_data["employees"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Onboarded {len(employees)} employees; OTP emails queued."))
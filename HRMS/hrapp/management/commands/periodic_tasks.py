@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from hrapp.periodic import reconcile, report
+from hrapp.tasks import PERIODIC_TASKS
+
+
+class Command(BaseCommand):
+    help = "Show the periodic jobs with their next run and last duration."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reconcile", action="store_true", help="Fix the scheduled rows first.")
+
+    def handle(self, *args, **options):
+        if options["reconcile"]:
+            self.stdout.write(f"Reconciled: {reconcile(PERIODIC_TASKS)}")
+        for job in report(PERIODIC_TASKS):
+            next_run = timezone.localtime(job["next_run"]).isoformat() if job["next_run"] else "not scheduled"
+            last = f"{job['last_duration']}s" if job["last_duration"] is not None else "never"
+            state = " (running)" if job["running"] else ""
+            self.stdout.write(
+                f"{job['name']:<45} {job['queue'] or '-':<12} every {job['interval']:>6}s  next {next_run}{state}  last {last}"
+            )
@@ -0,0 +1,30 @@
+import signal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from hrapp.periodic import reconcile
+from hrapp.tasks import PERIODIC_TASKS
+from hrapp.workers import WorkerPool
+
+
+class Command(BaseCommand):
+    help = "Run background tasks from several queues concurrently (replaces process_tasks)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queue", action="append", dest="queues", help="Only serve these queues (repeatable).")
+        parser.add_argument("--poll", type=float, default=settings.TASK_WORKER_POLL_SECONDS)
+        parser.add_argument("--burst", action="store_true", help="Exit once the queues are drained.")
+
+    def handle(self, *args, **options):
+        queues = settings.TASK_WORKER_QUEUES
+        if options["queues"]:
+            unknown = set(options["queues"]) - set(queues)
+            if unknown:
+                raise CommandError(f"Unknown queue(s): {', '.join(sorted(unknown))}")
+            queues = {name: queues[name] for name in options["queues"]}
+        self.stdout.write(f"Periodic tasks reconciled: {reconcile(PERIODIC_TASKS)}")
+        pool = WorkerPool(queues)
+        signal.signal(signal.SIGTERM, pool.stop)
+        signal.signal(signal.SIGINT, pool.stop)
+        serving = ", ".join(f"{name} x{options.get('workers', 1)}" for name, options in queues.items())
+        self.stdout.write(f"Worker {pool.worker_name} serving {serving}")
+        pool.run(poll=options["poll"], heartbeat=settings.TASK_WORKER_HEARTBEAT_SECONDS, burst=options["burst"])
@@ -0,0 +1,34 @@
+import sqlite3
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from hrapp.routers import REPLICA
+
+SQLITE = "django.db.backends.sqlite3"
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database onto a SQLite replica, for running with a replica locally."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=0, help="Keep copying every N seconds.")
+
+    def handle(self, *args, **options):
+        primary, replica = settings.DATABASES["default"], settings.DATABASES.get(REPLICA)
+        if replica is None:
+            raise CommandError("No replica configured; set REPLICA_DATABASE_URL.")
+        if primary["ENGINE"] != SQLITE or replica["ENGINE"] != SQLITE:
+            raise CommandError("Only SQLite replicas are synced here; use the database's own replication otherwise.")
+        while True:
+            started = time.monotonic()
+            source = sqlite3.connect(primary["NAME"])
+            target = sqlite3.connect(replica["NAME"], timeout=30)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            self.stdout.write(f"Replica synced in {time.monotonic() - started:.2f}s")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hrapp', '0005_periodicjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('task_name', models.CharField(max_length=190)),
+                ('queue', models.CharField(blank=True, default='', max_length=190)),
+                ('worker', models.CharField(blank=True, default='', max_length=64)),
+                ('status', models.CharField(choices=[('SUCCESS', 'Success'), ('ERROR', 'Error'), ('SKIPPED', 'Skipped')], default='SUCCESS', max_length=10)),
+                ('scheduled_for', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField()),
+                ('wait_seconds', models.FloatField(default=0)),
+                ('run_seconds', models.FloatField(default=0)),
+                ('queries', models.PositiveIntegerField(default=0)),
+                ('rows', models.PositiveIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['task_name', 'started_at'], name='hrapp_taskr_task_na_466eda_idx'), models.Index(fields=['started_at'], name='hrapp_taskr_started_ba500b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hrapp', '0006_taskrun'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payroll',
+            name='period',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='hrapp.payrollperiod'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'status'], name='hrapp_atten_date_07e457_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'check_out'], name='hrapp_atten_date_2fc590_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['employee', 'status', 'start_date', 'end_date'], name='hrapp_leave_employe_a72fcf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['user', 'code', 'is_used'], name='hrapp_otp_user_id_ea4a07_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['expiration_time'], name='hrapp_otp_expirat_29cc76_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payroll',
+            index=models.Index(fields=['period', 'status'], name='hrapp_payro_period__d2c1d3_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:44
+
+import django.db.models.deletion
+from decimal import Decimal, InvalidOperation
+from django.db import migrations, models
+
+FIELDS = {
+    "base_salary": Decimal("0.01"),
+    "daily_rate": Decimal("0.01"),
+    "paid_days": Decimal("0.01"),
+    "unpaid_days": Decimal("0.01"),
+    "overtime_hours": Decimal("0.0001"),
+}
+
+
+def _decimal(value, exp):
+    try:
+        return Decimal(str(value)).quantize(exp)
+    except (InvalidOperation, TypeError, ValueError):
+        return Decimal(0).quantize(exp)
+
+
+def backfill_line_items(apps, schema_editor):
+    Payroll = apps.get_model("hrapp", "Payroll")
+    PayrollLineItem = apps.get_model("hrapp", "PayrollLineItem")
+    batch = []
+    for pk, line_items in Payroll.objects.order_by().values_list("pk", "line_items").iterator(chunk_size=2000):
+        line_items = line_items if isinstance(line_items, dict) else {}
+        batch.append(PayrollLineItem(
+            payroll_id=pk, **{name: _decimal(line_items.get(name, 0), exp) for name, exp in FIELDS.items()},
+        ))
+        if len(batch) >= 2000:
+            PayrollLineItem.objects.bulk_create(batch)
+            batch = []
+    PayrollLineItem.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hrapp', '0008_attendancearchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollLineItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_salary', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('daily_rate', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('paid_days', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=6)),
+                ('unpaid_days', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=6)),
+                ('overtime_hours', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=8)),
+                ('payroll', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='line_item', to='hrapp.payroll')),
+            ],
+        ),
+        migrations.RunPython(backfill_line_items, migrations.RunPython.noop),
+    ]
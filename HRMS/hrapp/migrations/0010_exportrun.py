@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hrapp', '0009_payrolllineitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=50)),
+                ('since', models.DateTimeField(blank=True, null=True)),
+                ('until', models.DateTimeField()),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('path', models.CharField(max_length=500)),
+                ('finished_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['table', 'until'], name='hrapp_expor_table_c097c9_idx')],
+            },
+        ),
+    ]
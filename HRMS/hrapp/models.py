@@ -109,10 +109,102 @@ class OTP(models.Model):
     is_used = models.BooleanField(default=False)
     expiration_time = models.DateTimeField(default=default_otp_expiry)
 
+    class Meta:
+        indexes = [models.Index(fields=["user", "code", "is_used"]), models.Index(fields=["expiration_time"])]
+
     def __str__(self):
         return f"OTP for {self.user.email} - {'Used' if self.is_used else 'Unused'}"
 
 
+class OutboxEmail(models.Model):
+    STATUS = [
+        ("PENDING", "Pending"),
+        ("SENT", "Sent"),
+        ("DEAD", "Dead"),
+    ]
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS, default="PENDING")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    lease_token = models.CharField(max_length=32, blank=True, default="")
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to} - {self.status}"
+
+
+class RevokedToken(models.Model):
+    jti = models.CharField(max_length=255, unique=True)
+    user_id = models.PositiveBigIntegerField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.jti} (expires {self.expires_at})"
+
+
+class PeriodicJob(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    locked_by = models.CharField(max_length=64, blank=True, default="")
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_finished_at = models.DateTimeField(null=True, blank=True)
+    last_duration = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return self.name
+
+
+class TaskRun(models.Model):
+    STATUS = [
+        ("SUCCESS", "Success"),
+        ("ERROR", "Error"),
+        ("SKIPPED", "Skipped"),
+    ]
+    task_id = models.PositiveBigIntegerField(null=True, blank=True)
+    task_name = models.CharField(max_length=190)
+    queue = models.CharField(max_length=190, blank=True, default="")
+    worker = models.CharField(max_length=64, blank=True, default="")
+    status = models.CharField(max_length=10, choices=STATUS, default="SUCCESS")
+    scheduled_for = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField()
+    wait_seconds = models.FloatField(default=0)
+    run_seconds = models.FloatField(default=0)
+    queries = models.PositiveIntegerField(default=0)
+    rows = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+
+    class Meta:
+        indexes = [models.Index(fields=["task_name", "started_at"]), models.Index(fields=["started_at"])]
+
+    def __str__(self):
+        return f"{self.task_name} {self.status} {self.run_seconds:.2f}s"
+
+
+class ExportRun(models.Model):
+    # One warehouse export (hrapp.warehouse); the next incremental export of the table picks up
+    # rows updated after the latest run's `until`
+    table = models.CharField(max_length=50)
+    since = models.DateTimeField(null=True, blank=True)
+    until = models.DateTimeField()
+    rows = models.PositiveIntegerField(default=0)
+    path = models.CharField(max_length=500)
+    finished_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["table", "until"])]
+
+    def __str__(self):
+        return f"{self.table} until {self.until} ({self.rows} rows)"
+
+
 class Attendance(models.Model):
     STATUS_CHOICES = [
         ("present", "Present"),
@@ -127,9 +219,11 @@ class Attendance(models.Model):
     check_in = models.DateTimeField(null=True, blank=True)
     check_out = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         unique_together = ("employee", "date")
+        indexes = [models.Index(fields=["date", "status"]), models.Index(fields=["date", "check_out"])]
 
     @property
     def hours_worked(self):
@@ -142,6 +236,23 @@ class Attendance(models.Model):
     def overtime_hours(self):
         return max(0.0, self.hours_worked - get_work_hours())
 
+
+class AttendanceArchive(models.Model):
+    # Attendance moved out by retention (hrapp.retention): one row per employee and month,
+    # the rows stored as zlib-compressed JSON
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+    month = models.DateField()
+    row_count = models.PositiveIntegerField(default=0)
+    data = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("employee", "month")
+        indexes = [models.Index(fields=["month"])]
+
+    def __str__(self):
+        return f"{self.employee_id} {self.month:%Y-%m} ({self.row_count} rows)"
+
 class LeaveRequest(models.Model):
     STATUS = [
         ("PENDING", "Pending"),
@@ -170,10 +281,12 @@ class LeaveRequest(models.Model):
         related_name="approved_leaves",
     )
     is_paid = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         ordering = ["-created_at"]
         unique_together = ("employee", "start_date", "end_date")
+        indexes = [models.Index(fields=["employee", "status", "start_date", "end_date"])]
 
     @property
     def days(self):
@@ -207,7 +320,7 @@ class PayrollPeriod(models.Model):
 
 class Payroll(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
-    period = models.ForeignKey(PayrollPeriod, on_delete=models.CASCADE)
+    period = models.ForeignKey(PayrollPeriod, on_delete=models.CASCADE, db_index=False)
     gross = models.DecimalField(max_digits=12, decimal_places=2)
     overtime_pay = models.DecimalField(
         max_digits=12, decimal_places=2, default=Decimal("0.00")
@@ -226,10 +339,35 @@ class Payroll(models.Model):
     )
     generated_at = models.DateTimeField(auto_now_add=True)
     is_generating = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         unique_together = ("employee", "period")
         ordering = ["-generated_at"]
+        # Replaces the plain foreign-key index on period
+        indexes = [models.Index(fields=["period", "status"])]
+
+
+class PayrollLineItem(models.Model):
+    # Typed copy of Payroll.line_items so reports can aggregate days and overtime in SQL; the
+    # JSON stays for existing readers and both are written by the payroll engine
+    payroll = models.OneToOneField(Payroll, on_delete=models.CASCADE, related_name="line_item")
+    base_salary = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    daily_rate = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    paid_days = models.DecimalField(max_digits=6, decimal_places=2, default=Decimal("0.00"))
+    unpaid_days = models.DecimalField(max_digits=6, decimal_places=2, default=Decimal("0.00"))
+    overtime_hours = models.DecimalField(max_digits=8, decimal_places=4, default=Decimal("0.0000"))
+
+    FIELDS = ("base_salary", "daily_rate", "paid_days", "unpaid_days", "overtime_hours")
+
+    def as_json(self):
+        return {
+            "daily_rate": str(self.daily_rate),
+            "paid_days": float(self.paid_days),
+            "unpaid_days": float(self.unpaid_days),
+            "overtime_hours": float(self.overtime_hours),
+            "base_salary": str(self.base_salary),
+        }
 
 def get_work_hours():
     try:
@@ -0,0 +1,103 @@
+from datetime import timedelta
+import uuid
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import OutboxEmail
+
+
+def queue_emails(messages):
+    # messages: iterable of (to, subject, body). The rows commit or roll back with the caller's
+    # transaction; delivery is kicked once it commits.
+    rows = OutboxEmail.objects.bulk_create(
+        [OutboxEmail(to=to, subject=subject, body=body) for to, subject, body in messages],
+        batch_size=1000,
+    )
+    if rows:
+        transaction.on_commit(_kick_delivery)
+    return rows
+
+
+def queue_email(to, subject, body):
+    return queue_emails([(to, subject, body)])[0]
+
+
+def _kick_delivery():
+    from background_task.tasks import TaskSchedule
+    from .tasks import deliver_outbox_emails
+
+    # Pulls the repeating delivery task forward instead of adding a task per email
+    deliver_outbox_emails(schedule={"run_at": 0, "action": TaskSchedule.RESCHEDULE_EXISTING})
+
+
+def _backoff(attempts):
+    delay = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS))
+
+
+def _claim(batch_size, now):
+    # Leasing with a random token keeps concurrent senders from picking the same rows on
+    # databases without SELECT ... FOR UPDATE SKIP LOCKED (SQLite).
+    token = uuid.uuid4().hex
+    due = OutboxEmail.objects.filter(status="PENDING", next_attempt_at__lte=now)
+    ids = list(due.order_by("next_attempt_at", "id").values_list("id", flat=True)[:batch_size])
+    if not ids:
+        return []
+    lease_until = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+    due.filter(id__in=ids).update(lease_token=token, next_attempt_at=lease_until)
+    return list(OutboxEmail.objects.filter(lease_token=token, status="PENDING"))
+
+
+def _fail(email, error, now):
+    email.attempts += 1
+    email.last_error = error
+    email.lease_token = ""
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = "DEAD"
+    else:
+        email.next_attempt_at = now + _backoff(email.attempts)
+    email.save(update_fields=["attempts", "last_error", "lease_token", "status", "next_attempt_at"])
+
+
+def deliver_pending(batch_size=None, connection=None):
+    # Sends one batch over a single SMTP connection. Returns (sent, failed).
+    now = timezone.now()
+    batch = _claim(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE, now)
+    if not batch:
+        return 0, 0
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        for email in batch:
+            _fail(email, f"connection: {e}", now)
+        return 0, len(batch)
+
+    sent_ids, failed = [], 0
+    try:
+        for email in batch:
+            message = EmailMessage(email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.to], connection=connection)
+            try:
+                message.send()
+                sent_ids.append(email.id)
+            except Exception as e:
+                failed += 1
+                _fail(email, str(e), now)
+    finally:
+        connection.close()
+    OutboxEmail.objects.filter(id__in=sent_ids).update(
+        status="SENT", sent_at=timezone.now(), lease_token="", attempts=F("attempts") + 1
+    )
+    return len(sent_ids), failed
+
+
+def deliver_all(batch_size=None):
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = deliver_pending(batch_size)
+        if not sent and not failed:
+            return total_sent, total_failed
+        total_sent += sent
+        total_failed += failed
@@ -0,0 +1,104 @@
+from datetime import timedelta
+from functools import wraps
+import logging
+import os
+import threading
+import time
+from background_task.models import Task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .instrumentation import mark_skipped
+from .models import PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+
+def _job_name(fn):
+    return f"{fn.__module__}.{fn.__name__}"
+
+
+def _acquire(name, holder):
+    now = timezone.now()
+    PeriodicJob.objects.get_or_create(name=name)
+    free = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    return PeriodicJob.objects.filter(free, name=name).update(
+        locked_by=holder, locked_until=now + timedelta(seconds=settings.MAX_RUN_TIME), last_started_at=now,
+    )
+
+
+def single_flight(fn):
+    # At most one run of a job at a time across all workers; an overlapping run is skipped.
+    # The lock is a conditional UPDATE on the job's PeriodicJob row and lapses after
+    # MAX_RUN_TIME if the holder dies.
+    name = _job_name(fn)
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        holder = f"{os.getpid()}:{threading.get_ident()}"
+        if not _acquire(name, holder):
+            logger.info("%s is already running, skipping this run", name)
+            mark_skipped()
+            return None
+        started = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            PeriodicJob.objects.filter(name=name, locked_by=holder).update(
+                locked_by="", locked_until=None, last_finished_at=timezone.now(),
+                last_duration=round(time.monotonic() - started, 3),
+            )
+    return wrapper
+
+
+def reconcile(jobs):
+    # Leaves exactly one repeating Task row per registered job with the declared interval,
+    # queue and priority, and drops repeating hrapp.tasks rows for jobs no longer declared.
+    # Other modules' repeating rows are left alone.
+    created = removed = updated = 0
+    with transaction.atomic():
+        orphans = Task.objects.filter(repeat__gt=0, task_name__startswith="hrapp.tasks.").exclude(
+            task_name__in=[proxy.name for proxy, _ in jobs],
+        )
+        removed += orphans.delete()[0]
+        for proxy, interval in jobs:
+            rows = list(Task.objects.filter(task_name=proxy.name, repeat__gt=0).order_by("locked_at", "run_at"))
+            if not rows:
+                proxy(repeat=interval)
+                created += 1
+                continue
+            # A row that is running right now wins, otherwise the one due first
+            running = [row for row in rows if row.locked_by]
+            keep = running[0] if running else rows[0]
+            extra = [row.pk for row in rows if row.pk != keep.pk]
+            if extra:
+                removed += Task.objects.filter(pk__in=extra).delete()[0]
+            fields = {"repeat": interval, "queue": proxy.queue, "priority": proxy.schedule.priority}
+            if any(getattr(keep, field) != value for field, value in fields.items()):
+                Task.objects.filter(pk=keep.pk).update(**fields)
+                updated += 1
+    return {"created": created, "removed": removed, "updated": updated}
+
+
+def report(jobs):
+    names = [proxy.name for proxy, _ in jobs]
+    rows = {}
+    for task in Task.objects.filter(task_name__in=names, repeat__gt=0).order_by("run_at"):
+        rows.setdefault(task.task_name, task)
+    states = PeriodicJob.objects.in_bulk(names, field_name="name")
+    now = timezone.now()
+    result = []
+    for proxy, interval in jobs:
+        task = rows.get(proxy.name)
+        state = states.get(proxy.name)
+        result.append({
+            "name": proxy.name,
+            "queue": proxy.queue,
+            "interval": interval,
+            "next_run": task.run_at if task else None,
+            "running": bool(state and state.locked_until and state.locked_until > now),
+            "last_finished": state.last_finished_at if state else None,
+            "last_duration": state.last_duration if state else None,
+        })
+    return result
@@ -1,4 +1,37 @@
 from rest_framework.permissions import BasePermission
+from .authentication import get_employee_id
+from .models import Attendance, AttendanceArchive, CustomUser, Employee, LeaveBalance, LeaveRequest, PaymentProfile, Payroll
+
+# Ownership per model, read from the foreign-key id already on the row: "user" rows belong
+# to the user they point at, "employee" rows to the caller's employee.
+OWNER_FIELDS = {
+    CustomUser: ("id", "user"),
+    Employee: ("user_id", "user"),
+    PaymentProfile: ("employee_id", "employee"),
+    Attendance: ("employee_id", "employee"),
+    AttendanceArchive: ("employee_id", "employee"),
+    LeaveRequest: ("employee_id", "employee"),
+    LeaveBalance: ("employee_id", "employee"),
+    Payroll: ("employee_id", "employee"),
+}
+
+
+def _owner_value(kind, user):
+    return user.pk if kind == "user" else get_employee_id(user)
+
+
+def is_owner(obj, user):
+    if type(obj) not in OWNER_FIELDS:
+        return False
+    field, kind = OWNER_FIELDS[type(obj)]
+    value = _owner_value(kind, user)
+    return value is not None and getattr(obj, field) == value
+
+
+def scope_to_owner(queryset, user):
+    field, kind = OWNER_FIELDS[queryset.model]
+    value = _owner_value(kind, user)
+    return queryset.filter(**{field: value}) if value is not None else queryset.none()
 
 def _roles_for_view(view):
     roles = None
@@ -24,8 +57,4 @@ class IsOwnerOrRoleAllowed(BasePermission):
         roles = _roles_for_view(view) or []
         if getattr(request.user, "role", None) in roles:
             return True
-        if hasattr(obj, "user"):
-            return obj.user == request.user
-        if hasattr(obj, "employee"):
-            return getattr(obj.employee, "user", None) == request.user
-        return False
+        return is_owner(obj, request.user)
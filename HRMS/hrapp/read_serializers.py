@@ -0,0 +1,144 @@
+from decimal import Decimal
+from django.utils import timezone
+from .models import Attendance, LeaveRequest, Payroll, get_work_hours
+
+CENTS = Decimal("0.01")
+
+
+def _date(value):
+    return value.isoformat() if value else None
+
+
+def _datetime(value):
+    if not value:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def _decimal(value):
+    if value is None:
+        return ""
+    return f"{value.quantize(CENTS):f}"
+
+
+def _hours_worked(check_in, check_out):
+    if check_in and check_out:
+        return round((check_out - check_in).total_seconds() / 3600, 2)
+    return 0.0
+
+
+def _file_url(name, ctx):
+    if not name:
+        return None
+    url = ctx["storage"].url(name)
+    request = ctx.get("request")
+    return request.build_absolute_uri(url) if request else url
+
+
+class RowEncoder:
+    # Builds the same dicts as the matching ModelSerializer straight from values_list() rows.
+    # Each template entry is (key, expression); {column} placeholders become tuple lookups
+    # ({{ and }} are literal braces, as in str.format) and the whole row is compiled once
+    # into a single dict-literal lambda.
+    helpers = {
+        "_date": _date,
+        "_datetime": _datetime,
+        "_decimal": _decimal,
+        "_hours_worked": _hours_worked,
+        "_file_url": _file_url,
+    }
+
+    def __init__(self, model, columns, template):
+        self.model = model
+        self.columns = tuple(columns)
+        lookups = {column: f"r[{i}]" for i, column in enumerate(self.columns)}
+        body = ", ".join(f"{key!r}: {expr.format_map(lookups)}" for key, expr in template)
+        source = f"lambda r, ctx: {{{body}}}"
+        self.encode_row = eval(compile(source, f"<{model.__name__}RowEncoder>", "eval"), dict(self.helpers))
+
+    def context(self, request=None):
+        return {"request": request, "work_hours": get_work_hours()}
+
+    def iter_encode(self, queryset, request=None, chunk_size=None):
+        ctx = self.context(request)
+        rows = queryset.values_list(*self.columns)
+        if chunk_size:
+            rows = rows.iterator(chunk_size=chunk_size)
+        encode_row = self.encode_row
+        for row in rows:
+            yield encode_row(row, ctx)
+
+    def encode(self, queryset, request=None):
+        return list(self.iter_encode(queryset, request))
+
+
+class PayrollRowEncoder(RowEncoder):
+    def context(self, request=None):
+        ctx = super().context(request)
+        ctx["storage"] = Payroll._meta.get_field("payslip_file").storage
+        return ctx
+
+
+attendance_encoder = RowEncoder(
+    Attendance,
+    ["id", "employee_id", "employee__fullname", "date", "check_in", "check_out", "status"],
+    [
+        ("id", "{id}"),
+        ("employee_id", "{employee_id}"),
+        ("employee", '{{"id": {employee_id}, "fullname": {employee__fullname}}}'),
+        ("date", "_date({date})"),
+        ("check_in", "_datetime({check_in})"),
+        ("check_out", "_datetime({check_out})"),
+        ("status", "{status}"),
+        ("hours_worked", "_hours_worked({check_in}, {check_out})"),
+        ("overtime_hours", 'max(0.0, _hours_worked({check_in}, {check_out}) - ctx["work_hours"])'),
+    ],
+)
+
+leave_request_encoder = RowEncoder(
+    LeaveRequest,
+    [
+        "id", "employee_id", "employee__fullname", "type", "start_date", "end_date", "reason",
+        "status", "created_at", "action_by_id", "action_by__email", "is_paid",
+    ],
+    [
+        ("id", "{id}"),
+        ("employee", '{{"id": {employee_id}, "fullname": {employee__fullname}}}'),
+        ("type", "{type}"),
+        ("start_date", "_date({start_date})"),
+        ("end_date", "_date({end_date})"),
+        ("reason", "{reason}"),
+        ("status", "{status}"),
+        ("created_at", "_datetime({created_at})"),
+        ("action_by", '{{"id": {action_by_id}, "email": {action_by__email}}} if {action_by_id} is not None else None'),
+        ("is_paid", "{is_paid}"),
+        ("days", "({end_date} - {start_date}).days + 1"),
+    ],
+)
+
+payroll_encoder = PayrollRowEncoder(
+    Payroll,
+    [
+        "id", "employee_id", "employee__fullname", "period_id", "gross", "overtime_pay", "deductions",
+        "net", "currency", "line_items", "payslip_file", "status", "generated_at", "is_generating",
+    ],
+    [
+        ("id", "{id}"),
+        ("employee_id", "{employee_id}"),
+        ("employee", '{{"id": {employee_id}, "fullname": {employee__fullname}}}'),
+        ("period", "{period_id}"),
+        ("gross", "_decimal({gross})"),
+        ("overtime_pay", "_decimal({overtime_pay})"),
+        ("deductions", "_decimal({deductions})"),
+        ("net", "_decimal({net})"),
+        ("currency", "{currency}"),
+        ("line_items", "{line_items}"),
+        ("payslip_file", "_file_url({payslip_file}, ctx)"),
+        ("status", "{status}"),
+        ("generated_at", "_datetime({generated_at})"),
+        ("is_generating", "{is_generating}"),
+    ],
+)
@@ -0,0 +1,143 @@
+import csv
+from decimal import Decimal
+import re
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_LINE_SEPARATORS = (b"\xe2\x80\xa8", b"\xe2\x80\xa9")
+_ESCAPED_SEPARATORS = (b"\\u2028", b"\\u2029")
+_fallback_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # orjson handles str/int/float/dict/list, date, datetime and UUID natively; everything
+    # else goes through DRF's encoder so the output stays the same as JSONRenderer.
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return _fallback_encoder.default(obj)
+
+
+def _escape_line_separators(data):
+    if _LINE_SEPARATORS[0] in data or _LINE_SEPARATORS[1] in data:
+        for raw, escaped in zip(_LINE_SEPARATORS, _ESCAPED_SEPARATORS):
+            data = data.replace(raw, escaped)
+    return data
+
+
+class FastJSONRenderer(JSONRenderer):
+    # Uses orjson when it is installed and the output can match JSONRenderer (compact,
+    # unescaped unicode). Indented output, ASCII-only settings and anything orjson rejects
+    # fall back to the stock renderer.
+    options = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+    def dumps(self, data):
+        try:
+            return _escape_line_separators(orjson.dumps(data, default=_default, option=self.options))
+        except (TypeError, orjson.JSONEncodeError):
+            return None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if orjson is not None and not self.ensure_ascii and self.compact:
+            if self.get_indent(accepted_media_type, renderer_context or {}) is None:
+                ret = self.dumps(data)
+                if ret is not None:
+                    return ret
+        return super().render(data, accepted_media_type, renderer_context)
+
+    def iter_render(self, items, batch_size=500):
+        # Renders an iterable as a JSON array in chunks so large lists never exist as one
+        # Python list or one bytes object.
+        yield b"["
+        batch = []
+        first = True
+        for item in items:
+            batch.append(self.render(item))
+            if len(batch) >= batch_size:
+                yield (b"," if not first else b"") + b",".join(batch)
+                batch, first = [], False
+        if batch:
+            yield (b"," if not first else b"") + b",".join(batch)
+        yield b"]"
+
+
+def _flatten(row, prefix=""):
+    flat = {}
+    for key, value in row.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+_NUMBER = re.compile(r"[+-]?\d+(\.\d+)?")
+
+
+def _cell(value):
+    # Text starting like a formula is prefixed with ' so spreadsheets show it instead of
+    # evaluating it (free text such as leave reasons ends up in HR's spreadsheets). Plain
+    # numbers such as "-12.50" are left alone.
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES) and not _NUMBER.fullmatch(value):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        fieldnames = list(_flatten(rows[0])) if rows else []
+        return b"".join(self.iter_render(rows, fieldnames))
+
+    def iter_render(self, rows, fieldnames, batch_size=500):
+        buffer = _Echo()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames, restval="", extrasaction="ignore")
+        yield writer.writeheader().encode()
+        batch = []
+        for row in rows:
+            batch.append(writer.writerow({key: _cell(value) for key, value in _flatten(row).items()}))
+            if len(batch) >= batch_size:
+                yield "".join(batch).encode()
+                batch = []
+        if batch:
+            yield "".join(batch).encode()
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return b"".join(self.iter_render(data if isinstance(data, list) else [data]))
+
+    def iter_render(self, rows, fieldnames=None, batch_size=500):
+        renderer = FastJSONRenderer()
+        batch = []
+        for row in rows:
+            batch.append(renderer.render(row))
+            if len(batch) >= batch_size:
+                yield b"\n".join(batch) + b"\n"
+                batch = []
+        if batch:
+            yield b"\n".join(batch) + b"\n"
@@ -0,0 +1,126 @@
+from datetime import date, timedelta
+import json
+import time
+import zlib
+from background_task.models import CompletedTask
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import OTP, Attendance, AttendanceArchive
+
+
+def _delete(model, ids):
+    return model.objects.filter(pk__in=ids).delete()[0]
+
+
+def purge(queryset, batch_size=None):
+    # Deletes in primary-key batches, each its own short write transaction, so a large backlog
+    # never holds the database write lock for long
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += _delete(queryset.model, ids)
+        time.sleep(settings.RETENTION_BATCH_PAUSE)
+
+
+def purge_otps():
+    return purge(OTP.objects.filter(Q(is_used=True) | Q(expiration_time__lt=timezone.now())))
+
+
+def purge_completed_tasks():
+    cutoff = timezone.now() - timedelta(days=settings.COMPLETED_TASK_RETENTION_DAYS)
+    return purge(CompletedTask.objects.filter(run_at__lt=cutoff))
+
+
+def attendance_cutoff(today=None):
+    # Whole months only, so an archived month never also has live rows
+    today = today or timezone.localdate()
+    return date(today.year - settings.ATTENDANCE_RETENTION_YEARS, today.month, 1)
+
+
+def _pack(rows):
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode())
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data))
+
+
+def _archive_row(pk, day, check_in, check_out, status):
+    return [pk, day.isoformat(), check_in and check_in.isoformat(), check_out and check_out.isoformat(), status]
+
+
+def archive_attendance(batch_size=None):
+    # Moves attendance before the cutoff into AttendanceArchive, batch by batch; a month split
+    # across batches is merged into the same archive row.
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    cutoff = attendance_cutoff()
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Attendance.objects.filter(date__lt=cutoff).order_by("date", "employee_id")
+                .values_list("employee_id", "id", "date", "check_in", "check_out", "status")[:batch_size]
+            )
+            if not rows:
+                return moved
+            groups = {}
+            for employee_id, *row in rows:
+                groups.setdefault((employee_id, row[1].replace(day=1)), []).append(_archive_row(*row))
+            existing = {
+                (archive.employee_id, archive.month): archive
+                for archive in AttendanceArchive.objects.filter(
+                    employee_id__in={key[0] for key in groups}, month__in={key[1] for key in groups},
+                )
+            }
+            created, updated = [], []
+            for (employee_id, month), new_rows in groups.items():
+                archive = existing.get((employee_id, month))
+                if archive is None:
+                    archive = AttendanceArchive(employee_id=employee_id, month=month)
+                    created.append(archive)
+                else:
+                    new_rows = list({row[0]: row for row in _unpack(archive.data) + new_rows}.values())
+                    updated.append(archive)
+                new_rows.sort(key=lambda row: row[1])
+                archive.data, archive.row_count, archive.archived_at = _pack(new_rows), len(new_rows), timezone.now()
+            AttendanceArchive.objects.bulk_create(created)
+            AttendanceArchive.objects.bulk_update(updated, ["data", "row_count", "archived_at"])
+            _delete(Attendance, [row[1] for row in rows])
+        moved += len(rows)
+        time.sleep(settings.RETENTION_BATCH_PAUSE)
+
+
+def archived_attendance(employee_id=None, start=None, end=None, status=None, using=None):
+    # Yields archived rows as (id, employee_id, employee__fullname, date, check_in, check_out,
+    # status), the columns of read_serializers.attendance_encoder, ordered by date and employee.
+    # using= should be the database the live rows are read from, so a replica lagging behind
+    # the archive job neither repeats nor drops the rows being moved.
+    archives = AttendanceArchive.objects.using(using).order_by("month", "employee_id")
+    if employee_id is not None:
+        archives = archives.filter(employee_id=employee_id)
+    if start:
+        archives = archives.filter(month__gte=start.replace(day=1))
+    if end:
+        archives = archives.filter(month__lte=end)
+    month, pending = None, []
+    for archive_month, archive_employee, fullname, data in archives.values_list(
+        "month", "employee_id", "employee__fullname", "data",
+    ).iterator(chunk_size=200):
+        if archive_month != month:
+            yield from sorted(pending, key=lambda row: (row[3], row[1]))
+            month, pending = archive_month, []
+        for pk, day, check_in, check_out, row_status in _unpack(bytes(data)):
+            day = parse_date(day)
+            if (start and day < start) or (end and day > end) or (status and row_status != status):
+                continue
+            pending.append((
+                pk, archive_employee, fullname, day,
+                check_in and parse_datetime(check_in), check_out and parse_datetime(check_out), row_status,
+            ))
+    yield from sorted(pending, key=lambda row: (row[3], row[1]))
@@ -0,0 +1,145 @@
+from datetime import datetime, timezone as dt_timezone
+import hashlib
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import RevokedToken
+from .retention import purge
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+LAST_ID_KEY = "hrapp:revocation:last_id"
+LAST_ID_LOCK_KEY = "hrapp:revocation:last_id:lock"
+ENTRY_KEY = "hrapp:revocation:{}"
+
+
+class RevocationFilter:
+    # Per-process Bloom filter over the revoked jtis. A miss means "not revoked" without a
+    # query; a hit is confirmed against the table. Each revocation is published to the
+    # shared cache under its row id together with the highest id, so other processes catch
+    # up from the cache and only go to the table when an id is missing. The filter is
+    # rebuilt periodically so compacted rows drop out.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._last_id = 0
+        self._built_at = 0.0
+        self._gap = None
+
+    def _rebuild(self):
+        bloom = BloomFilter(settings.TOKEN_REVOCATION_CAPACITY, settings.TOKEN_REVOCATION_ERROR_RATE)
+        last_id = 0
+        rows = RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list("id", "jti")
+        for pk, jti in rows.iterator(chunk_size=5000):
+            bloom.add(jti)
+            last_id = max(last_id, pk)
+        # Ids published after the query are picked up by the next _catch_up
+        self._filter, self._last_id, self._built_at, self._gap = bloom, last_id, time.monotonic(), None
+
+    def _catch_up(self, last_id):
+        # Applies ids in order and stops at the first one found neither in the cache nor in
+        # the table: its transaction may not have committed yet, so it is retried on the next
+        # sync. One still missing after TOKEN_REVOCATION_GAP_SECONDS was rolled back (or its
+        # expired row compacted) and is skipped.
+        ids = range(self._last_id + 1, last_id + 1)
+        found = cache.get_many([ENTRY_KEY.format(pk) for pk in ids]) if len(ids) <= 1000 else {}
+        jtis = {pk: found[ENTRY_KEY.format(pk)] for pk in ids if ENTRY_KEY.format(pk) in found}
+        if len(jtis) < len(ids):
+            jtis.update(RevokedToken.objects.filter(id__gt=self._last_id, id__lte=last_id).values_list("id", "jti"))
+        for pk in ids:
+            if pk in jtis:
+                self._filter.add(jtis[pk])
+            elif self._gap is None or self._gap[0] != pk:
+                self._gap = (pk, time.monotonic())
+                return
+            elif time.monotonic() - self._gap[1] < settings.TOKEN_REVOCATION_GAP_SECONDS:
+                return
+            self._last_id = pk
+
+    def sync(self):
+        last_id = cache.get(LAST_ID_KEY, 0)
+        with self._lock:
+            if self._filter is None or time.monotonic() - self._built_at > settings.TOKEN_REVOCATION_REBUILD_SECONDS:
+                self._rebuild()
+            if last_id > self._last_id:
+                self._catch_up(last_id)
+
+    def add(self, jti):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+
+    def might_contain(self, jti):
+        self.sync()
+        return jti in self._filter
+
+
+revocations = RevocationFilter()
+
+
+def _raise_last_id(pk):
+    # LAST_ID_KEY only ever moves forward: two revocations publishing at once must not leave
+    # it at the lower id. The lock is a cache.add() that lapses on its own if its holder dies.
+    for _ in range(100):
+        if cache.add(LAST_ID_LOCK_KEY, pk, 5):
+            try:
+                if cache.get(LAST_ID_KEY, 0) < pk:
+                    cache.set(LAST_ID_KEY, pk, None)
+            finally:
+                cache.delete(LAST_ID_LOCK_KEY)
+            return
+        time.sleep(0.01)
+
+
+def _publish(pk, jti):
+    cache.set(ENTRY_KEY.format(pk), jti, settings.TOKEN_REVOCATION_REBUILD_SECONDS * 2)
+    _raise_last_id(pk)
+
+
+def is_revoked(token):
+    jti = token[settings.SIMPLE_JWT.get("JTI_CLAIM", "jti")]
+    if not revocations.might_contain(jti):
+        return False
+    return RevokedToken.objects.filter(jti=jti).exists()
+
+
+def revoke(token):
+    jti = token[settings.SIMPLE_JWT.get("JTI_CLAIM", "jti")]
+    expires_at = datetime.fromtimestamp(token["exp"], tz=dt_timezone.utc)
+    try:
+        with transaction.atomic():
+            row = RevokedToken.objects.create(
+                jti=jti, user_id=token.get(settings.SIMPLE_JWT["USER_ID_CLAIM"]), expires_at=expires_at,
+            )
+    except IntegrityError:
+        return False
+    revocations.add(jti)
+    transaction.on_commit(lambda: _publish(row.pk, jti))
+    return True
+
+
+def compact(batch_size=None):
+    return purge(RevokedToken.objects.filter(expires_at__lte=timezone.now()), batch_size)
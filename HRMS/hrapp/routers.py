@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA = "replica"
+PIN_KEY = "hrapp:replica:pinned:{}"
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def pin_to_primary(user_id):
+    # Keeps the user's reads on the primary until the replica has caught up with their write
+    cache.set(PIN_KEY.format(user_id), 1, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return cache.get(PIN_KEY.format(user_id)) is not None
+
+
+class PrimaryReplicaRouter:
+    # Everything runs on the primary unless a view binds its queryset to the replica (see
+    # ReplicaReadMixin). Related rows are read from the database their parent came from and
+    # writes always go to the primary, even for objects loaded from the replica.
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+class ReplicaReadMixin:
+    # Safe requests to the listed actions read from the replica unless the user wrote something
+    # within REPLICA_PIN_SECONDS. Response-cached actions should stay off the list: a lagging
+    # replica would fill the cache with stale rows under the new model version.
+    replica_actions = ()
+
+    def use_replica(self):
+        if not hasattr(self, "_use_replica"):
+            request = self.request
+            self._use_replica = (
+                replica_configured()
+                and request.method in SAFE_METHODS
+                and getattr(self, "action", None) in self.replica_actions
+                and not (request.user.is_authenticated and is_pinned(request.user.pk))
+            )
+        return self._use_replica
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        return qs.using(REPLICA) if self.use_replica() else qs
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replica_configured():
+            # DRF copies the authenticated user back onto the Django request
+            user = getattr(request, "user", None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.pk)
+        return response
@@ -1,3 +1,4 @@
+from collections import Counter
 from datetime import date, datetime
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
@@ -17,10 +18,75 @@ from .models import (
     Payroll,
     CustomUser,
 )
+from .authentication import get_employee_id
 
 User = get_user_model()
 
 
+def _query_param_set(request, name):
+    params = getattr(request, "query_params", None)
+    if params is None or name not in params:
+        return None
+    return {part.strip() for part in params.get(name, "").split(",") if part.strip()}
+
+
+class DynamicFieldsMixin:
+    # Meta.expandable_fields: nested relation -> columns read on the related model
+    # Meta.computed_fields: property field -> model columns it is computed from
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        requested = _query_param_set(request, "fields")
+        expand = _query_param_set(request, "expand")
+        self.is_sparse = requested is not None or expand is not None
+        expandable = getattr(self.Meta, "expandable_fields", {})
+
+        if requested is not None:
+            for name in list(self.fields):
+                if name not in requested:
+                    self.fields.pop(name)
+
+        self.expanded_fields = set(expandable) if expand is None else expand & set(expandable)
+        for name in set(expandable) - self.expanded_fields:
+            if name in self.fields:
+                self.fields[name] = serializers.IntegerField(source=f"{name}_id", read_only=True, allow_null=True)
+
+    def optimize_queryset(self, queryset):
+        expandable = getattr(self.Meta, "expandable_fields", {})
+        computed = getattr(self.Meta, "computed_fields", {})
+        columns = {self.Meta.model._meta.pk.name}
+        relations = []
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if name in expandable and name in self.expanded_fields:
+                relations.append(name)
+                columns.add(name)
+                columns.update(f"{name}__{column}" for column in expandable[name])
+            elif name in computed:
+                columns.update(computed[name])
+            elif field.source != "*":
+                columns.add(field.source.split(".")[0])
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns)
+
+
+def validate_password_policy(value):
+    if len(value) < 8:
+        raise serializers.ValidationError("Password must be at least 8 characters long.")
+    if not re.search(r"[A-Z]", value):
+        raise serializers.ValidationError("Password must contain at least one uppercase letter.")
+    if not re.search(r"[a-z]", value):
+        raise serializers.ValidationError("Password must contain at least one lowercase letter.")
+    if not re.search(r"\d", value):
+        raise serializers.ValidationError("Password must contain at least one number.")
+    if not re.search(r"[@$!%*?&^#()\-_=+{};:,<.>]", value):
+        raise serializers.ValidationError("Password must contain at least one special character.")
+    return value
+
+
 class UserSignupSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
     confirm_password = serializers.CharField(write_only=True)
@@ -41,17 +107,7 @@ class UserSignupSerializer(serializers.ModelSerializer):
         return value
 
     def validate_password(self, value):
-        if len(value) < 8:
-            raise serializers.ValidationError("Password must be at least 8 characters long.")
-        if not re.search(r"[A-Z]", value):
-            raise serializers.ValidationError("Password must contain at least one uppercase letter.")
-        if not re.search(r"[a-z]", value):
-            raise serializers.ValidationError("Password must contain at least one lowercase letter.")
-        if not re.search(r"\d", value):
-            raise serializers.ValidationError("Password must contain at least one number.")
-        if not re.search(r"[@$!%*?&^#()\-_=+{};:,<.>]", value):
-            raise serializers.ValidationError("Password must contain at least one special character.")
-        return value
+        return validate_password_policy(value)
 
     def validate(self, data):
         if data.get("password") != data.get("confirm_password"):
@@ -78,21 +134,21 @@ class UserLoginSerializer(serializers.Serializer):
         return data
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ["id", "email", "role", "is_active"]
         read_only_fields = fields
 
 
-class DepartmentSerializer(serializers.ModelSerializer):
+class DepartmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Department
         fields = ["id", "name"]
         read_only_fields = ["id"]
 
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), source="user", write_only=True)
     department_id = serializers.PrimaryKeyRelatedField(queryset=Department.objects.all(), source="department", write_only=True)
     user = serializers.SerializerMethodField()
@@ -115,6 +171,7 @@ class EmployeeSerializer(serializers.ModelSerializer):
             "pending_update",
         ]
         read_only_fields = ["id", "is_verified", "pending_update"]
+        expandable_fields = {"user": ("id", "email"), "department": ("id", "name")}
         
     def validate_user_id(self, value):
         if Employee.objects.filter(user=value).exists():
@@ -131,6 +188,46 @@ class EmployeeSerializer(serializers.ModelSerializer):
         return {"id": obj.department.id, "name": obj.department.name} if obj.department else None
 
 
+def _summarize(values, limit=20):
+    values = sorted(map(str, values))
+    more = f" (and {len(values) - limit} more)" if len(values) > limit else ""
+    return ", ".join(values[:limit]) + more
+
+
+class OnboardEmployeeSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+    fullname = serializers.CharField(max_length=200)
+    department_id = serializers.IntegerField(required=False, allow_null=True)
+    designation = serializers.CharField(max_length=100, required=False, allow_blank=True, allow_null=True)
+    date_of_joining = serializers.DateField(required=False)
+    bank_account = serializers.CharField(max_length=30, required=False, allow_blank=True, allow_null=True)
+    ifsc_code = serializers.CharField(max_length=15, required=False, allow_blank=True, allow_null=True)
+    base_salary = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    # Optional; without one the employee sets a password when verifying their OTP
+    password = serializers.CharField(write_only=True, required=False, validators=[validate_password_policy])
+
+
+class BulkOnboardSerializer(serializers.Serializer):
+    employees = OnboardEmployeeSerializer(many=True, allow_empty=False)
+
+    def validate_employees(self, rows):
+        # Checked with one query per table rather than one per row
+        emails = [User.objects.normalize_email(row["email"]) for row in rows]
+        duplicates = [email for email, count in Counter(email.lower() for email in emails).items() if count > 1]
+        if duplicates:
+            raise serializers.ValidationError(f"Duplicate emails in request: {_summarize(duplicates)}")
+        existing = set()
+        for start in range(0, len(emails), 500):
+            existing.update(User.objects.filter(email__in=emails[start:start + 500]).values_list("email", flat=True))
+        if existing:
+            raise serializers.ValidationError(f"Emails already registered: {_summarize(existing)}")
+        department_ids = {row["department_id"] for row in rows if row.get("department_id")}
+        missing = department_ids - set(Department.objects.filter(id__in=department_ids).values_list("id", flat=True))
+        if missing:
+            raise serializers.ValidationError(f"Departments do not exist: {_summarize(missing)}")
+        return rows
+
+
 class EmployeeSelfUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Employee
@@ -141,7 +238,7 @@ class EmployeeSelfUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("At least one field must be provided for update.")
         return attrs
 
-class PaymentProfileSerializer(serializers.ModelSerializer):
+class PaymentProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee_id = serializers.PrimaryKeyRelatedField(queryset=Employee.objects.all(), source="employee")
     employee = serializers.SerializerMethodField()
 
@@ -149,12 +246,13 @@ class PaymentProfileSerializer(serializers.ModelSerializer):
         model = PaymentProfile
         fields = ["id", "employee_id", "employee", "base_salary", "overtime_payment", "last_updated"]
         read_only_fields = ["id", "last_updated"]
+        expandable_fields = {"employee": ("id", "fullname")}
 
     def get_employee(self, obj):
         return {"id": obj.employee.id, "fullname": obj.employee.fullname} if obj.employee else None
 
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee_id = serializers.PrimaryKeyRelatedField(queryset=Employee.objects.all(), source="employee")
     employee = serializers.SerializerMethodField(read_only=True)
 
@@ -172,6 +270,8 @@ class AttendanceSerializer(serializers.ModelSerializer):
             "overtime_hours",
         ]
         read_only_fields = ["id", "hours_worked", "overtime_hours","status"]
+        expandable_fields = {"employee": ("id", "fullname")}
+        computed_fields = {"hours_worked": ("check_in", "check_out"), "overtime_hours": ("check_in", "check_out")}
 
     def get_employee(self, obj):
         return {"id": obj.employee.id, "fullname": obj.employee.fullname} if obj.employee else None
@@ -197,7 +297,7 @@ class AttendanceSerializer(serializers.ModelSerializer):
         raise serializers.ValidationError("Invalid datetime format. Use ISO 8601 format.")
 
 
-class LeaveRequestSerializer(serializers.ModelSerializer):
+class LeaveRequestSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee = serializers.SerializerMethodField(read_only=True)
     action_by = serializers.SerializerMethodField(read_only=True)
     days = serializers.IntegerField(read_only=True)
@@ -218,6 +318,8 @@ class LeaveRequestSerializer(serializers.ModelSerializer):
             "days",
         ]
         read_only_fields = ["id", "status", "created_at", "action_by", "is_paid", "days"]
+        expandable_fields = {"employee": ("id", "fullname"), "action_by": ("id", "email")}
+        computed_fields = {"days": ("start_date", "end_date")}
 
     def get_employee(self, obj):
         return {"id": obj.employee.id, "fullname": obj.employee.fullname} if obj.employee else None
@@ -227,41 +329,42 @@ class LeaveRequestSerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
         request = self.context["request"]
-        user = request.user
-        if not hasattr(user, "employee"):
+        employee_id = get_employee_id(request.user)
+        if employee_id is None:
             raise serializers.ValidationError("The user is not linked to any employee profile.")
         start = attrs.get("start_date")
         end = attrs.get("end_date")
         if start and end and start > end:
             raise serializers.ValidationError("Start date cannot be greater than end date.")
-        existing = LeaveRequest.objects.filter(employee=user.employee, start_date=start, end_date=end).first()
-        if existing and existing.status in ["approved", "rejected", "pending"]:
+        existing = LeaveRequest.objects.filter(employee_id=employee_id, start_date=start, end_date=end).first()
+        if existing and existing.status.lower() in ["approved", "rejected", "pending"]:
             raise serializers.ValidationError(
                 f"A leave request from {start} to {end} already exists with status '{existing.status}'."
             )
         return attrs
 
     def create(self, validated_data):
-        user = self.context["request"].user
-        validated_data["employee"] = user.employee
+        if "employee" not in validated_data and "employee_id" not in validated_data:
+            validated_data["employee_id"] = get_employee_id(self.context["request"].user)
         leave_type = validated_data.get("type")
         validated_data["is_paid"] = False if leave_type == "Unpaid" else True
         return super().create(validated_data)
 
 
-class LeaveBalanceSerializer(serializers.ModelSerializer):
+class LeaveBalanceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee = serializers.SerializerMethodField()
 
     class Meta:
         model = LeaveBalance
         fields = ["id", "employee", "casual", "sick"]
         read_only_fields = ["id", "employee"]
+        expandable_fields = {"employee": ("id", "fullname")}
 
     def get_employee(self, obj):
         return {"id": obj.employee.id, "fullname": obj.employee.fullname} if obj.employee else None
 
 
-class PayrollPeriodSerializer(serializers.ModelSerializer):
+class PayrollPeriodSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PayrollPeriod
         fields = ["id", "start", "end", "is_closed"]
@@ -279,7 +382,7 @@ class PayrollPeriodSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class PayrollSerializer(serializers.ModelSerializer):
+class PayrollSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     employee_id = serializers.PrimaryKeyRelatedField(queryset=Employee.objects.all(), source="employee")
     employee = serializers.SerializerMethodField()
     period = serializers.PrimaryKeyRelatedField(queryset=PayrollPeriod.objects.all())
@@ -303,6 +406,7 @@ class PayrollSerializer(serializers.ModelSerializer):
             "is_generating",
         ]
         read_only_fields = ["id", "net", "payslip_file", "generated_at", "is_generating"]
+        expandable_fields = {"employee": ("id", "fullname")}
 
     def get_employee(self, obj):
         return {"id": obj.employee.id, "fullname": obj.employee.fullname} if obj.employee else None
@@ -311,6 +415,8 @@ class PayrollSerializer(serializers.ModelSerializer):
 class VerifyOTPSerializer(serializers.Serializer):
     email = serializers.EmailField(write_only=True)
     otp = serializers.CharField(write_only=True)
+    # Required for accounts created without a password (bulk onboarding)
+    password = serializers.CharField(write_only=True, required=False, validators=[validate_password_policy])
 
     def validate(self, data):
         email = data.get("email")
@@ -324,6 +430,8 @@ class VerifyOTPSerializer(serializers.Serializer):
             raise serializers.ValidationError({"otp": "Invalid OTP"})
         if otp_obj.expiration_time < timezone.now():
             raise serializers.ValidationError({"otp": "OTP expired"})
+        if not data.get("password") and not user.has_usable_password():
+            raise serializers.ValidationError({"password": "Set a password to activate this account."})
         data["user"] = user
         data["otp_obj"] = otp_obj
         return data
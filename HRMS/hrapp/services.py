@@ -1,10 +1,16 @@
 import os
 from pathlib import Path
+import random
 import re
 import tempfile
+from django.contrib.auth.hashers import make_password
 from django.core.files.base import ContentFile
+from django.db import transaction
 from docxtpl import DocxTemplate
 from django.conf import settings
+from .cache import bump_version
+from .models import OTP, CustomUser, Employee, LeaveBalance, PaymentProfile
+from .utils import send_otp_emails
 
 
 def generate_payslip_docx(payroll, template_rel_path="templates/payslip_template.docx"):
@@ -67,3 +73,62 @@ def generate_payslip_docx(payroll, template_rel_path="templates/payslip_template
             pass
 
     return payroll.payslip_file.name
+
+
+def bulk_onboard_employees(rows, batch_size=1000):
+    # Creates users, employees, payment profiles, leave balances and OTPs with one bulk INSERT
+    # per table (per batch_size rows) instead of the per-row post_save cascade. OTP emails go
+    # to the outbox in the same transaction. rows are validated dicts.
+    overtime = settings.COMPANY_CONFIG.get("payment", {}).get("overtime", 500)
+    leave_settings = settings.COMPANY_CONFIG.get("leave", {})
+    # Hashing is deliberately slow, so it happens before the transaction takes the write lock.
+    # Rows without a password get an unusable one and set it when verifying their OTP.
+    passwords = [make_password(row.get("password") or None) for row in rows]
+
+    with transaction.atomic():
+        users = CustomUser.objects.bulk_create(
+            [
+                CustomUser(
+                    email=CustomUser.objects.normalize_email(row["email"]),
+                    password=password,
+                    role="employee",
+                    is_active=False,
+                )
+                for row, password in zip(rows, passwords)
+            ],
+            batch_size=batch_size,
+        )
+        employees = Employee.objects.bulk_create(
+            [
+                Employee(
+                    user=user,
+                    fullname=row["fullname"],
+                    department_id=row.get("department_id"),
+                    designation=row.get("designation"),
+                    bank_account=row.get("bank_account"),
+                    ifsc_code=row.get("ifsc_code"),
+                    **({"date_of_joining": row["date_of_joining"]} if row.get("date_of_joining") else {}),
+                )
+                for user, row in zip(users, rows)
+            ],
+            batch_size=batch_size,
+        )
+        PaymentProfile.objects.bulk_create(
+            [
+                PaymentProfile(employee=emp, base_salary=row.get("base_salary") or 0, overtime_payment=overtime)
+                for emp, row in zip(employees, rows)
+            ],
+            batch_size=batch_size,
+        )
+        LeaveBalance.objects.bulk_create(
+            [
+                LeaveBalance(employee=emp, casual=leave_settings.get("casual", 0), sick=leave_settings.get("sick", 0))
+                for emp in employees
+            ],
+            batch_size=batch_size,
+        )
+        otps = [OTP(user=user, code=f"{random.randint(100000, 999999)}") for user in users]
+        OTP.objects.bulk_create(otps, batch_size=batch_size)
+        send_otp_emails((user.email, otp.code) for user, otp in zip(users, otps))
+        bump_version(CustomUser, Employee, PaymentProfile, LeaveBalance, OTP)
+    return employees
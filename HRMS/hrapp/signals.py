@@ -1,28 +1,27 @@
 import random
-from django.db import OperationalError, ProgrammingError
-from django.db.models.signals import post_save,post_migrate
+from django.db import DEFAULT_DB_ALIAS, OperationalError, ProgrammingError, transaction
+from django.db.models.signals import post_delete, post_save,post_migrate
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from background_task.models import Task
-from .tasks import async_generate_payroll, auto_flag_missing_checkout, auto_generate_monthly_payroll, auto_mark_absent_or_leave, delete_expired_otps
-from .models import OTP, Department, Employee, LeaveBalance, PaymentProfile,PayrollPeriod
+from .tasks import PERIODIC_TASKS, async_generate_payroll
+from .periodic import reconcile
+from .models import OTP, Attendance, Department, Employee, LeaveBalance, LeaveRequest, PaymentProfile, Payroll, PayrollPeriod
 from .utils import send_otp_email
+from .cache import bump_version
+from .analytics import evict_period_costs
+from .authentication import employee_identities, user_cache
+from .snapshot import today_snapshot
+from .events import publish_attendance, publish_leave
 from django.conf import settings
 User = get_user_model()
 
 @receiver(post_migrate)
-def schedule_background_tasks(sender, **kwargs):
-    TASKS = [
-            ("hrapplication.tasks.auto_mark_absent_or_leave", auto_mark_absent_or_leave, 86400),
-            ("hrapplication.tasks.auto_flag_missing_checkout", auto_flag_missing_checkout, 86400),
-            ("hrapplication.tasks.auto_generate_monthly_payroll", auto_generate_monthly_payroll, 86400),
-            ("hrapplication.tasks.delete_expired_otps", delete_expired_otps, 3600),
-        ]
-
+def schedule_background_tasks(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if sender.name != "hrapp" or using != DEFAULT_DB_ALIAS:
+        return
     try:
-        for task_name, task_function, interval in TASKS:
-            if not Task.objects.filter(task_name=task_name).exists():
-                task_function(repeat=interval)
+        reconcile(PERIODIC_TASKS)
     except (OperationalError, ProgrammingError):
         pass
 
@@ -32,6 +31,23 @@ def create_departments(sender, **kwargs):
         if isinstance(dept_name, (list, tuple)) and len(dept_name) >= 2:
             Department.objects.get_or_create(name=dept_name[1], defaults={"description": dept_name[0]})
 
+# Only the models cached responses and ETags are built from (see views.cache_response and
+# etag_related_models); a post_delete receiver on any other model would stop Django from
+# fast-deleting its rows.
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Department)
+@receiver([post_save, post_delete], sender=Employee)
+@receiver([post_save, post_delete], sender=PaymentProfile)
+@receiver([post_save, post_delete], sender=Payroll)
+def invalidate_cached_responses(sender, **kwargs):
+    bump_version(sender)
+    transaction.on_commit(lambda: bump_version(sender))
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_cached_user(sender, instance, **kwargs):
+    user_cache.pop(instance.pk)
+
 @receiver(post_save, sender=User)
 def create_otp_for_inactive_user(sender, instance, created, **kwargs):
     if created and not instance.is_active and instance.role != "hr":
@@ -39,6 +55,46 @@ def create_otp_for_inactive_user(sender, instance, created, **kwargs):
         OTP.objects.create(user=instance, code=otp_code)  
         send_otp_email(instance.email, otp_code)
 
+@receiver(post_save, sender=PayrollPeriod)
+@receiver(post_delete, sender=PayrollPeriod)
+@receiver(post_save, sender=Payroll)
+@receiver(post_delete, sender=Payroll)
+def invalidate_period_costs(sender, instance, **kwargs):
+    period_id = instance.pk if sender is PayrollPeriod else instance.period_id
+    transaction.on_commit(lambda: evict_period_costs(period_id))
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def evict_employee_identity(sender, instance, **kwargs):
+    employee_identities.pop(instance.user_id)
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+def update_today_snapshot(sender, instance, signal, **kwargs):
+    deleted = signal is post_delete
+    if sender is Attendance:
+        transaction.on_commit(lambda: today_snapshot.attendance_changed(instance, deleted))
+    else:
+        transaction.on_commit(lambda: today_snapshot.leave_changed(instance, deleted))
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+def publish_events(sender, instance, signal, **kwargs):
+    publish = publish_attendance if sender is Attendance else publish_leave
+    deleted = signal is post_delete
+    transaction.on_commit(lambda: publish(instance, deleted))
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def reload_today_snapshot(sender, **kwargs):
+    transaction.on_commit(today_snapshot.invalidate)
+
 @receiver(post_save, sender=Employee)            
 def create_employee_related_profiles(sender, instance, created, **kwargs):
     if created:
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+import threading
+import time
+from django.conf import settings
+from django.db.models import Exists, FilteredRelation, OuterRef, Q
+from django.utils import timezone
+from .attendance_analytics import LATE_GRACE_MINUTES
+from .models import Employee, LeaveRequest, get_current_date
+
+STATES = ("checked_in", "checked_out", "on_leave", "absent")
+
+
+def _late_after():
+    work_start = settings.COMPANY_CONFIG.get("work_hours", {}).get("start", "09:00")
+    return (datetime.strptime(work_start, "%H:%M") + timedelta(minutes=LATE_GRACE_MINUTES)).time()
+
+
+def _state(check_in, check_out, status, on_leave):
+    if check_in:
+        return "checked_out" if check_out else "checked_in"
+    return "on_leave" if on_leave or status == "on_leave" else "absent"
+
+
+class TodaySnapshot:
+    # Who is checked in, checked out, late, on leave or absent today, per department. Built
+    # from one query, then kept current in memory by the Attendance and LeaveRequest signals
+    # (see signals.update_today_snapshot) so polling it costs no queries. Every process has its
+    # own copy; TODAY_SNAPSHOT_TTL_SECONDS bounds how long another process's writes, or bulk
+    # updates that send no signals, take to show up.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day = None
+        self._expires = 0
+        self._employees = {}
+        self._departments = {}
+        self._payloads = {}
+
+    def _load(self, day):
+        approved_leave = LeaveRequest.objects.filter(
+            employee=OuterRef("pk"), status="APPROVED", start_date__lte=day, end_date__gte=day,
+        )
+        rows = (
+            Employee.objects.order_by()
+            .annotate(today=FilteredRelation("attendance", condition=Q(attendance__date=day)), on_leave=Exists(approved_leave))
+            .values_list("id", "department_id", "department__name", "fullname", "today__check_in", "today__check_out", "today__status", "on_leave")
+        )
+        late_after = _late_after()
+        employees, departments = {}, {}
+        for pk, department_id, department, fullname, check_in, check_out, status, on_leave in rows:
+            departments[department_id] = department
+            employees[pk] = {
+                "department_id": department_id, "fullname": fullname, "on_leave": on_leave,
+                "state": _state(check_in, check_out, status, on_leave),
+                "late": bool(check_in) and timezone.localtime(check_in).time() > late_after,
+            }
+        self._day, self._expires = day, time.monotonic() + settings.TODAY_SNAPSHOT_TTL_SECONDS
+        self._employees, self._departments, self._payloads = employees, departments, {}
+
+    def _current(self):
+        day = get_current_date()
+        if day != self._day or time.monotonic() >= self._expires:
+            self._load(day)
+
+    def get(self, detail=False):
+        with self._lock:
+            self._current()
+            if detail not in self._payloads:
+                self._payloads[detail] = self._payload(detail)
+            return self._payloads[detail]
+
+    def _payload(self, detail):
+        groups = {}
+        for pk, employee in self._employees.items():
+            group = groups.get(employee["department_id"])
+            if group is None:
+                group = groups[employee["department_id"]] = {
+                    "department_id": employee["department_id"],
+                    "department": self._departments.get(employee["department_id"]),
+                    "headcount": 0, "late": 0, **{state: 0 for state in STATES},
+                }
+                if detail:
+                    group["employees"] = []
+            group["headcount"] += 1
+            group[employee["state"]] += 1
+            group["late"] += employee["late"]
+            if detail:
+                group["employees"].append({"id": pk, "fullname": employee["fullname"], "state": employee["state"], "late": employee["late"]})
+        departments = sorted(groups.values(), key=lambda group: (group["department_id"] is None, group["department"] or ""))
+        totals = {key: sum(group[key] for group in departments) for key in ("headcount", "late", *STATES)}
+        return {"date": self._day.isoformat(), "departments": departments, "totals": totals}
+
+    def _update(self, employee_id, change, day=None):
+        # Runs change(employee, day) and applies the fields it returns under the lock, so the
+        # state it reads is the state it updates. change returns {} when today is unaffected
+        # and None when only a load can tell; a change for another day's snapshot is dropped.
+        with self._lock:
+            if self._day is None or (day is not None and day != self._day):
+                return
+            changes = change(self._employees.get(employee_id), self._day)
+            if changes is None:
+                self._expires = 0
+            elif changes:
+                self._employees[employee_id].update(changes)
+                self._payloads = {}
+
+    def attendance_changed(self, attendance, deleted=False):
+        check_in, check_out, status = (None, None, None) if deleted else (attendance.check_in, attendance.check_out, attendance.status)
+        if isinstance(check_in, str) or isinstance(check_out, str):
+            # Assigned as a raw ISO string (manual_checkout) and only parsed by the database
+            return self.invalidate()
+        late = bool(check_in) and timezone.localtime(check_in).time() > _late_after()
+
+        def change(employee, day):
+            if employee is None:
+                return None
+            return {"state": _state(check_in, check_out, status, employee["on_leave"]), "late": late}
+        self._update(attendance.employee_id, change, attendance.date)
+
+    def leave_changed(self, leave, deleted=False):
+        approved = not deleted and leave.status == "APPROVED"
+
+        def change(employee, day):
+            if not (leave.start_date <= day <= leave.end_date):
+                return {}
+            # Another approved leave may still cover today; only a load can tell
+            if employee is None or (employee["on_leave"] and not approved):
+                return None
+            state = employee["state"] if employee["state"] in ("checked_in", "checked_out") else ("on_leave" if approved else "absent")
+            return {"on_leave": approved, "state": state}
+        self._update(leave.employee_id, change)
+
+    def invalidate(self):
+        with self._lock:
+            self._expires = 0
+
+
+today_snapshot = TodaySnapshot()
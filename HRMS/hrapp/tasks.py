@@ -1,26 +1,41 @@
 from background_task import background
 from django.utils import timezone
 from datetime import timedelta
-from .models import Employee, Attendance, LeaveRequest, PayrollPeriod, Payroll, OTP
+from .models import Employee, Attendance, LeaveRequest, PayrollPeriod, Payroll
 from calendar import monthrange
 from datetime import date
 from .utils import generate_payroll_for_period
+from .outbox import deliver_all
+from .revocation import compact
+from .periodic import single_flight
+from .instrumentation import prune_runs, record_rows
+from .retention import archive_attendance, purge_completed_tasks, purge_otps
+from django.conf import settings
 from .services import generate_payslip_docx
-from django.db import transaction
+from .cache import bump_version
+from django.db import connection, transaction
 
+# Queues served by run_task_workers (see TASK_WORKER_QUEUES) and priorities within a queue;
+# higher runs first.
+PRIORITY_INTERACTIVE = 100
+PRIORITY_NOTIFICATION = 50
+PRIORITY_BULK = 0
 
-@background(schedule=60)
+
+@background(schedule=60, queue="maintenance")
+@single_flight
 def auto_mark_absent_or_leave():
     today = timezone.localdate()
     yesterday = today - timedelta(days=1)
 
+    marked = 0
     for emp in Employee.objects.all():
 
         if Attendance.objects.filter(employee=emp, date=yesterday).exists():
             continue
 
         leave_exists = LeaveRequest.objects.filter(
-            user=emp.user,
+            employee=emp,
             status="APPROVED",
             start_date__lte=yesterday,
             end_date__gte=yesterday
@@ -33,8 +48,11 @@ def auto_mark_absent_or_leave():
             check_in=None,
             check_out=None
         )
+        marked += 1
+    record_rows(marked)
 
-@background(schedule=60)
+@background(schedule=60, queue="maintenance")
+@single_flight
 def auto_flag_missing_checkout():
     today = timezone.localdate() - timedelta(days=1)
     records = Attendance.objects.filter(
@@ -42,11 +60,15 @@ def auto_flag_missing_checkout():
         check_in__isnull=False,
         check_out__isnull=True,
     )
+    flagged = 0
     for att in records:
         att.status = "missing_checkout"
         att.save()
+        flagged += 1
+    record_rows(flagged)
 
-@background(schedule=60)
+@background(schedule=60, queue="maintenance")
+@single_flight
 def auto_generate_monthly_payroll():
     today = date.today()
     last_day = monthrange(today.year, today.month)[1]
@@ -63,29 +85,104 @@ def auto_generate_monthly_payroll():
             print("PayrollPeriod already exists")
             
 
-@background(schedule=10)
+@background(schedule={"run_at": 10, "priority": PRIORITY_BULK}, queue="payroll")
 def async_generate_payroll(period_id, task_name=None):
     try:
         with transaction.atomic():
             result = generate_payroll_for_period(period_id)
+        record_rows(len(result["result"]))
         period = PayrollPeriod.objects.get(id=period_id)
         print(f"{task_name}: Payroll generation completed for PayrollPeriod {period}.")
     except Exception as e:
         print(f"Error generating payroll/payslips for PayrollPeriod {period_id}: {str(e)}")
+        raise
 
   
-@background(schedule=5)
+@background(schedule={"run_at": 5, "priority": PRIORITY_INTERACTIVE}, queue="interactive")
 def generate_payslip_background(payroll_id):
     try:
         payroll = Payroll.objects.get(id=payroll_id)
         generate_payslip_docx(payroll)
         payroll.is_generating = False
         payroll.save()
+        record_rows(1)
     except Exception as e:
-        Payroll.objects.filter(id=payroll_id).update(is_generating=False)
+        Payroll.objects.filter(id=payroll_id).update(is_generating=False, updated_at=timezone.now())
+        bump_version(Payroll)
         print(f"Payslip generation failed for Payroll ID {payroll_id} – {e}")
+        raise
 
-@background(schedule=3600)
+@background(schedule=3600, queue="maintenance")
+@single_flight
 def delete_expired_otps():
-    OTP.objects.filter(is_used=True).delete()
-    OTP.objects.filter(expiration_time__lt=timezone.now()).delete()
\ No newline at end of file
+    record_rows(purge_otps())
+
+@background(schedule={"run_at": 60, "priority": PRIORITY_NOTIFICATION}, queue="interactive")
+@single_flight
+def deliver_outbox_emails():
+    sent, failed = deliver_all()
+    record_rows(sent + failed)
+    if sent or failed:
+        print(f"Outbox delivery: {sent} sent, {failed} failed")
+
+@background(schedule=3600, queue="maintenance")
+@single_flight
+def compact_revoked_tokens():
+    deleted = compact()
+    record_rows(deleted)
+    if deleted:
+        print(f"Compacted {deleted} expired revoked tokens")
+
+@background(schedule=86400, queue="maintenance")
+@single_flight
+def prune_task_runs():
+    deleted = prune_runs(settings.TASK_RUN_RETENTION_DAYS)
+    record_rows(deleted)
+    if deleted:
+        print(f"Pruned {deleted} task run records")
+
+@background(schedule=86400, queue="maintenance")
+@single_flight
+def prune_completed_tasks():
+    deleted = purge_completed_tasks()
+    record_rows(deleted)
+    if deleted:
+        print(f"Pruned {deleted} completed background tasks")
+
+@background(schedule=86400, queue="maintenance")
+@single_flight
+def archive_old_attendance():
+    moved = archive_attendance()
+    record_rows(moved)
+    if moved:
+        print(f"Archived {moved} attendance records")
+
+@background(schedule=3600, queue="maintenance")
+@single_flight
+def sqlite_checkpoint():
+    # Folds the WAL back into the database and truncates it, which the automatic checkpoint
+    # cannot do while readers are active; PRAGMA optimize refreshes planner statistics.
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        busy, wal_pages, checkpointed = cursor.fetchone()
+        cursor.execute("PRAGMA optimize")
+    record_rows(max(checkpointed, 0))
+    if busy:
+        print(f"WAL checkpoint incomplete: {checkpointed} of {wal_pages} pages, readers still active")
+
+# Repeating jobs and their interval in seconds, reconciled into background_task rows by
+# hrapp.periodic.reconcile() after migrate and when run_task_workers starts.
+PERIODIC_TASKS = [
+    (auto_mark_absent_or_leave, 86400),
+    (auto_flag_missing_checkout, 86400),
+    (auto_generate_monthly_payroll, 86400),
+    (delete_expired_otps, 3600),
+    (deliver_outbox_emails, 60),
+    (compact_revoked_tokens, 3600),
+    (prune_task_runs, 86400),
+    (prune_completed_tasks, 86400),
+    (archive_old_attendance, 86400),
+    (sqlite_checkpoint, 3600),
+]
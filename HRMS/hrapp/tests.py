@@ -1,3 +1,589 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+import csv
+import io
+import json
+import re
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.mail.backends import locmem
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.utils import timezone
+from .authentication import HRTokenUser, employee_identities, user_cache
+from .cache import cache_metrics
+from .models import (
+    OTP, Attendance, AttendanceArchive, Department, Employee, LeaveBalance, LeaveRequest, OutboxEmail, PaymentProfile,
+    Payroll, PayrollPeriod, RevokedToken, get_current_date,
+)
+from .permissions import OWNER_FIELDS, is_owner, scope_to_owner
+from .outbox import _claim, deliver_pending
+from .retention import archive_attendance, attendance_cutoff
+from .revocation import LAST_ID_KEY, RevocationFilter, compact
+from .read_serializers import attendance_encoder, leave_request_encoder, payroll_encoder
+from .renderers import FastJSONRenderer
+from .serializers import AttendanceSerializer, BulkOnboardSerializer, LeaveRequestSerializer, PayrollSerializer
+from .snapshot import today_snapshot
+from .services import bulk_onboard_employees
 
-# Create your tests here.
+LOCMEM_CACHE = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "default"},
+    "responses": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "responses"},
+}
+FAST_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class HRMSTestCase(TestCase):
+    # HR plus two employees in different departments, each with a day of attendance, a leave
+    # request and a payroll
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.engineering = Department.objects.create(name="Engineering")
+        cls.operations = Department.objects.create(name="Operations")
+        cls.hr = User.objects.create(email="hr@example.com", role="hr", is_active=True)
+        cls.alice = cls.create_employee("alice@example.com", "Alice", cls.engineering)
+        cls.bob = cls.create_employee("bob@example.com", "Bob", cls.operations)
+        cls.period = PayrollPeriod.objects.create(start=date(2024, 1, 1), end=date(2024, 1, 31))
+        day = date(2024, 1, 15)
+        for employee in (cls.alice, cls.bob):
+            check_in = timezone.make_aware(timezone.datetime(2024, 1, 15, 9, 0))
+            Attendance.objects.create(
+                employee=employee, date=day, check_in=check_in, check_out=check_in + timedelta(hours=9), status="present",
+            )
+            LeaveRequest.objects.create(
+                employee=employee, type="CASUAL", start_date=date(2024, 2, 1), end_date=date(2024, 2, 2),
+                reason=f"{employee.fullname} away",
+            )
+            Payroll.objects.create(
+                employee=employee, period=cls.period, gross=Decimal("1000.00"), net=Decimal("900.00"),
+                deductions=Decimal("100.00"), line_items={"base_salary": "1000.00"},
+            )
+
+    @classmethod
+    def create_employee(cls, email, fullname, department):
+        user = get_user_model().objects.create(email=email, role="employee", is_active=True)
+        return Employee.objects.create(user=user, fullname=fullname, department=department, is_verified=True)
+
+    def setUp(self):
+        cache.clear()
+        caches["responses"].clear()
+        user_cache.clear()
+        employee_identities.clear()
+
+    @staticmethod
+    def access_token(user, claims=("role", "employee_id")):
+        # claims=() gives a token the stateless path ignores, so the user is loaded from the
+        # database; ("role",) leaves employee_id to be resolved from the identity map
+        token = RefreshToken.for_user(user).access_token
+        if "role" in claims:
+            token["role"] = user.role
+        if "employee_id" in claims:
+            employee = Employee.objects.filter(user=user).first()
+            token["employee_id"] = employee and employee.id
+        return token
+
+    def authenticate(self, user, claims=("role", "employee_id")):
+        self.client.cookies["access_token"] = str(self.access_token(user, claims))
+
+
+class QueryPlanTests(TestCase):
+    # Each hot query must reach its table through an index; "SCAN <table>" in the SQLite plan
+    # means a full table (or full index) scan.
+
+    def assertIndexed(self, queryset):
+        if connection.vendor != "sqlite":
+            self.skipTest("plans are only checked on SQLite")
+        table = queryset.model._meta.db_table
+        plan = queryset.explain()
+        self.assertIsNone(re.search(rf"\bSCAN {table}\b", plan), f"full scan of {table}:\n{plan}")
+        self.assertIn(f"SEARCH {table}", plan)
+
+    def test_attendance_by_date_and_status(self):
+        self.assertIndexed(Attendance.objects.filter(date__range=(date(2024, 1, 1), date(2024, 1, 31)), status="absent"))
+        self.assertIndexed(Attendance.objects.filter(date=date(2024, 1, 1)).values("status"))
+
+    def test_attendance_missing_checkout(self):
+        self.assertIndexed(Attendance.objects.filter(date=date(2024, 1, 1), check_in__isnull=False, check_out__isnull=True))
+
+    def test_attendance_by_employee_and_date(self):
+        self.assertIndexed(Attendance.objects.filter(employee_id=1, date__range=(date(2024, 1, 1), date(2024, 1, 31))))
+
+    def test_leave_overlap(self):
+        day = date(2024, 1, 15)
+        self.assertIndexed(LeaveRequest.objects.filter(employee_id=1, status="APPROVED", start_date__lte=day, end_date__gte=day))
+        self.assertIndexed(LeaveRequest.objects.filter(
+            employee_id=1, status="APPROVED", is_paid=False, start_date__lte=day, end_date__gte=day - timedelta(days=30),
+        ))
+
+    def test_payroll_by_period(self):
+        self.assertIndexed(Payroll.objects.filter(period_id=1))
+        self.assertIndexed(Payroll.objects.filter(period_id=1, status="DRAFT"))
+        self.assertIndexed(Payroll.objects.filter(employee_id=1, period_id=1))
+
+    def test_otp_lookup(self):
+        self.assertIndexed(OTP.objects.filter(user_id=1, code="123456", is_used=False).order_by("-created_at")[:1])
+
+    def test_otp_expiry(self):
+        self.assertIndexed(OTP.objects.filter(expiration_time__lt=timezone.now()))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, RETENTION_BATCH_PAUSE=0)
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_user_model().objects.create_superuser("hr@example.com", "secret")
+        response = self.client.post("/api/auth/login/", {"email": "hr@example.com", "password": "secret"})
+        self.assertEqual(response.status_code, 200)
+
+    def refresh(self):
+        return self.client.post("/api/auth/refresh/")
+
+    def test_logout_revokes_refresh_token(self):
+        refresh_token = self.client.cookies["refresh_token"].value
+        self.assertEqual(self.client.post("/api/auth/logout/").status_code, 200)
+        self.client.cookies["refresh_token"] = refresh_token
+        self.assertEqual(self.refresh().status_code, 401)
+
+    def test_rotated_refresh_token_cannot_be_reused(self):
+        old_token = self.client.cookies["refresh_token"].value
+        self.assertEqual(self.refresh().status_code, 200)
+        self.assertNotEqual(self.client.cookies["refresh_token"].value, old_token)
+        self.assertEqual(self.refresh().status_code, 200)
+        self.client.cookies["refresh_token"] = old_token
+        self.assertEqual(self.refresh().status_code, 401)
+
+    def test_compact_removes_only_expired_rows(self):
+        now = timezone.now()
+        RevokedToken.objects.create(jti="expired", expires_at=now - timedelta(minutes=1))
+        RevokedToken.objects.create(jti="live", expires_at=now + timedelta(days=1))
+        self.assertEqual(compact(), 1)
+        self.assertEqual(list(RevokedToken.objects.values_list("jti", flat=True)), ["live"])
+
+    def test_catch_up_waits_for_uncommitted_ids(self):
+        revocations = RevocationFilter()
+        revocations.sync()
+        first = RevokedToken.objects.create(jti="first", expires_at=timezone.now() + timedelta(days=1))
+        # Another process published first.pk + 1 before its row became visible here
+        cache.set(LAST_ID_KEY, first.pk + 1)
+        self.assertTrue(revocations.might_contain("first"))
+        second = RevokedToken.objects.create(jti="second", expires_at=timezone.now() + timedelta(days=1))
+        self.assertEqual(second.pk, first.pk + 1)
+        self.assertTrue(revocations.might_contain("second"))
+
+
+class OutboxBackend(locmem.EmailBackend):
+    # locmem backend that counts its connections and rejects mail to bounce@ addresses
+    connections = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        type(self).connections += 1
+
+    def send_messages(self, messages):
+        if any(address.startswith("bounce@") for message in messages for address in message.to):
+            raise OSError("mailbox unavailable")
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND="hrapp.tests.OutboxBackend", EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+class OutboxTests(TestCase):
+    def setUp(self):
+        OutboxBackend.connections = 0
+
+    def queue(self, *addresses):
+        return OutboxEmail.objects.bulk_create([OutboxEmail(to=to, subject="OTP", body="123456") for to in addresses])
+
+    def test_batch_is_sent_over_one_connection(self):
+        self.queue("a@example.com", "b@example.com", "c@example.com")
+        self.assertEqual(deliver_pending(), (3, 0))
+        self.assertEqual(OutboxBackend.connections, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboxEmail.objects.filter(status="SENT", attempts=1).count(), 3)
+
+    def test_failure_backs_off(self):
+        self.queue("bounce@example.com")
+        before = timezone.now()
+        self.assertEqual(deliver_pending(), (0, 1))
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts, email.lease_token), ("PENDING", 1, ""))
+        self.assertIn("mailbox unavailable", email.last_error)
+        self.assertGreaterEqual(email.next_attempt_at, before + timedelta(seconds=30))
+        self.assertEqual(deliver_pending(), (0, 0))
+
+    def test_dead_after_max_attempts(self):
+        self.queue("bounce@example.com")
+        for _ in range(2):
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(deliver_pending(), (0, 1))
+        self.assertEqual(OutboxEmail.objects.get().status, "DEAD")
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_pending(), (0, 0))
+
+    def test_leased_rows_are_not_claimed_twice(self):
+        self.queue("a@example.com", "b@example.com")
+        now = timezone.now()
+        self.assertEqual(len(_claim(10, now)), 2)
+        self.assertEqual(_claim(10, now), [])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class OnboardingTests(TestCase):
+    def onboard(self, *rows):
+        serializer = BulkOnboardSerializer(data={"employees": list(rows)})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return bulk_onboard_employees(serializer.validated_data["employees"])
+
+    def test_password_policy_matches_signup(self):
+        serializer = BulkOnboardSerializer(data={"employees": [
+            {"email": "weak@example.com", "fullname": "Weak", "password": "password1"},
+        ]})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("password", serializer.errors["employees"][0])
+
+    def test_creates_related_rows_and_queues_otps(self):
+        employees = self.onboard(
+            {"email": "a@example.com", "fullname": "A", "password": "Secret-123", "base_salary": "1000.00"},
+            {"email": "b@example.com", "fullname": "B"},
+        )
+        self.assertEqual(len(employees), 2)
+        ids = [employee.id for employee in employees]
+        self.assertEqual(PaymentProfile.objects.filter(employee_id__in=ids).count(), 2)
+        self.assertEqual(LeaveBalance.objects.filter(employee_id__in=ids).count(), 2)
+        self.assertEqual(OTP.objects.filter(user__employee__in=ids).count(), 2)
+        self.assertEqual(sorted(OutboxEmail.objects.values_list("to", flat=True)), ["a@example.com", "b@example.com"])
+        users = {user.email: user for user in get_user_model().objects.filter(employee__in=ids)}
+        self.assertFalse(any(user.is_active for user in users.values()))
+        self.assertTrue(users["a@example.com"].check_password("Secret-123"))
+        self.assertFalse(users["b@example.com"].has_usable_password())
+
+    def test_employee_without_password_sets_one_with_otp(self):
+        employee, = self.onboard({"email": "b@example.com", "fullname": "B"})
+        code = OTP.objects.get(user_id=employee.user_id).code
+        response = self.client.post("/api/auth/verify-otp/", {"email": "b@example.com", "otp": code})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json())
+        response = self.client.post("/api/auth/verify-otp/", {"email": "b@example.com", "otp": code, "password": "Secret-123"})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post("/api/auth/login/", {"email": "b@example.com", "password": "Secret-123"})
+        self.assertEqual(response.status_code, 200)
+
+
+class ExportTests(HRMSTestCase):
+    def export(self, path, accept="text/csv"):
+        response = self.client.get(path, HTTP_ACCEPT=accept)
+        return response, b"".join(response.streaming_content).decode() if response.streaming else response.content.decode()
+
+    def test_csv_header_and_rows(self):
+        self.authenticate(self.hr)
+        response, body = self.export("/api/attendance/export/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        lines = body.splitlines()
+        self.assertEqual(lines[0], "id,employee_id,employee.fullname,date,check_in,check_out,status,hours_worked,overtime_hours")
+        self.assertEqual(len(lines), 3)
+
+    def test_filters(self):
+        self.authenticate(self.hr)
+        _, body = self.export(f"/api/attendance/export/?employee_id={self.alice.id}", "application/x-ndjson")
+        self.assertEqual([row["employee_id"] for row in map(json.loads, body.splitlines())], [self.alice.id])
+        _, body = self.export("/api/leaves/export/?from=2024-03-01")
+        self.assertEqual(len(body.splitlines()), 1)
+        _, body = self.export(f"/api/payrolls/export/?period_id={self.period.id}&status=DRAFT")
+        self.assertEqual(len(body.splitlines()), 3)
+
+    def test_formula_cells_are_escaped(self):
+        LeaveRequest.objects.filter(employee=self.alice).update(reason="=HYPERLINK(\"http://x\")")
+        LeaveRequest.objects.filter(employee=self.bob).update(reason="-1+2")
+        self.authenticate(self.hr)
+        _, body = self.export("/api/leaves/export/")
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(sorted(row["reason"] for row in rows), ["'-1+2", "'=HYPERLINK(\"http://x\")"])
+        _, body = self.export("/api/payrolls/export/")
+        self.assertEqual({row["net"] for row in csv.DictReader(io.StringIO(body))}, {"900.00"})
+
+    def test_exports_are_hr_only_and_errors_are_json(self):
+        self.authenticate(self.alice.user)
+        for path in ("/api/attendance/export/", "/api/leaves/export/", "/api/payrolls/export/"):
+            response, body = self.export(path)
+            self.assertEqual(response.status_code, 403)
+            self.assertEqual(response["Content-Type"], "application/json")
+            self.assertIn("detail", json.loads(body))
+        self.client.cookies.clear()
+        response, _ = self.export("/api/attendance/export/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.authenticate(self.hr)
+        response, body = self.export("/api/attendance/export/?from=soon")
+        self.assertEqual((response.status_code, response["Content-Type"]), (400, "application/json"))
+
+
+@override_settings(RETENTION_BATCH_PAUSE=0)
+class AttendanceArchiveTests(HRMSTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        old_month = attendance_cutoff() - timedelta(days=45)
+        for offset, employee, status in ((0, cls.alice, "present"), (1, cls.bob, "absent"), (2, cls.alice, "late"), (40, cls.alice, "present")):
+            day = old_month + timedelta(days=offset)
+            check_in = timezone.make_aware(timezone.datetime(day.year, day.month, day.day, 9, 30)) if status != "absent" else None
+            Attendance.objects.create(employee=employee, date=day, check_in=check_in, status=status)
+
+    def history(self, user, query=""):
+        self.authenticate(user)
+        response = self.client.get(f"/api/attendance/history/{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_round_trip(self):
+        # Batches of one split a month across batches, so archive rows are merged
+        queries = ["", f"?employee_id={self.alice.id}", "?status=present", f"?to={attendance_cutoff()}"]
+        before = {query: self.history(self.hr, query) for query in queries}
+        own_before = self.history(self.alice.user)
+        self.assertEqual(archive_attendance(batch_size=1), 4)
+        self.assertFalse(Attendance.objects.filter(date__lt=attendance_cutoff()).exists())
+        for query in queries:
+            self.assertEqual(self.history(self.hr, query), before[query], query)
+        self.assertEqual(self.history(self.alice.user), own_before)
+        self.assertEqual(len(before[""]), 6)
+        self.assertEqual([(row["date"], row["employee_id"]) for row in before[""]], sorted((row["date"], row["employee_id"]) for row in before[""]))
+
+    def test_employees_only_see_their_own_history(self):
+        archive_attendance()
+        rows = self.history(self.alice.user)
+        self.assertEqual({row["employee_id"] for row in rows}, {self.alice.id})
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(self.history(self.alice.user, f"?employee_id={self.bob.id}"), [])
+
+
+class ResponseCacheTests(HRMSTestCase):
+    def get(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assertCounts(self, endpoint, hits, misses):
+        metrics = cache_metrics()[endpoint]
+        self.assertEqual((metrics["hits"], metrics["misses"]), (hits, misses))
+
+    def test_department_rename_invalidates_me(self):
+        self.authenticate(self.alice.user)
+        self.assertEqual(self.get("/api/employees/me/")["department"]["name"], "Engineering")
+        self.get("/api/employees/me/")
+        self.assertCounts("EmployeeViewSet.me", 1, 1)
+        Department.objects.filter(pk=self.engineering.pk).update(name="Platform")
+        self.assertEqual(self.get("/api/employees/me/")["department"]["name"], "Engineering")
+        department = Department.objects.get(pk=self.engineering.pk)
+        department.save()
+        self.assertEqual(self.get("/api/employees/me/")["department"]["name"], "Platform")
+        self.assertCounts("EmployeeViewSet.me", 2, 2)
+
+    def test_payment_profile_save_invalidates_mine(self):
+        self.authenticate(self.alice.user)
+        self.assertEqual(self.get("/api/payment-profiles/mine/")["base_salary"], "0.00")
+        self.get("/api/payment-profiles/mine/")
+        profile = PaymentProfile.objects.get(employee=self.alice)
+        profile.base_salary = Decimal("5000.00")
+        profile.save()
+        self.assertEqual(self.get("/api/payment-profiles/mine/")["base_salary"], "5000.00")
+        self.assertCounts("PaymentProfileViewSet.mine", 1, 2)
+
+    def test_payroll_save_invalidates_list(self):
+        self.authenticate(self.hr)
+        self.get("/api/payrolls/")
+        self.get("/api/payrolls/")
+        payroll = Payroll.objects.get(employee=self.alice)
+        payroll.status = "PAID"
+        payroll.save()
+        self.assertIn("PAID", [row["status"] for row in self.get("/api/payrolls/")])
+        self.assertCounts("PayrollViewSet.list", 1, 2)
+
+    def test_department_and_user_lists(self):
+        self.authenticate(self.hr)
+        self.get("/api/departments/")
+        self.get(f"/api/departments/{self.operations.pk}/")
+        Department.objects.create(name="Finance")
+        self.assertIn("Finance", [row["name"] for row in self.get("/api/departments/")])
+        self.assertCounts("DepartmentViewSet.list", 0, 2)
+        self.get("/api/users/")
+        user = self.bob.user
+        user.is_active = False
+        user.save()
+        self.assertFalse({row["email"]: row["is_active"] for row in self.get("/api/users/")}["bob@example.com"])
+        self.assertCounts("UserManageViewSet.list", 0, 2)
+
+    def test_unrelated_writes_keep_entries(self):
+        self.authenticate(self.alice.user)
+        self.get("/api/employees/me/")
+        Attendance.objects.create(employee=self.alice, date=date(2024, 1, 16), status="absent")
+        self.get("/api/employees/me/")
+        self.assertCounts("EmployeeViewSet.me", 1, 1)
+
+
+class OwnershipTests(HRMSTestCase):
+    # Every OWNER_FIELDS model, checked for the database-loaded user and for the token user
+    # with and without its employee_id claim
+    CLAIMS = {"database": (), "token": ("role", "employee_id"), "token without employee_id": ("role",)}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for employee in (cls.alice, cls.bob):
+            AttendanceArchive.objects.create(employee=employee, month=date(2020, 1, 1), data=b"")
+
+    def request_user(self, user, kind):
+        claims = self.CLAIMS[kind]
+        if not claims:
+            return get_user_model().objects.get(pk=user.pk)
+        return HRTokenUser(self.access_token(user, claims))
+
+    def owned(self, model, employee):
+        if model is get_user_model():
+            return employee.user
+        if model is Employee:
+            return employee
+        return model.objects.get(employee=employee)
+
+    def test_models(self):
+        self.assertEqual(len(OWNER_FIELDS), 8)
+        for kind in self.CLAIMS:
+            user = self.request_user(self.alice.user, kind)
+            for model in OWNER_FIELDS:
+                with self.subTest(kind=kind, model=model.__name__):
+                    mine, theirs = self.owned(model, self.alice), self.owned(model, self.bob)
+                    self.assertTrue(is_owner(mine, user))
+                    self.assertFalse(is_owner(theirs, user))
+                    self.assertEqual(list(scope_to_owner(model.objects.all(), user)), [mine])
+
+    def test_user_without_employee_owns_no_employee_rows(self):
+        for kind in self.CLAIMS:
+            user = self.request_user(self.hr, kind)
+            for model in OWNER_FIELDS:
+                if model not in (get_user_model(), Employee):
+                    with self.subTest(kind=kind, model=model.__name__):
+                        self.assertFalse(scope_to_owner(model.objects.all(), user).exists())
+                        self.assertFalse(is_owner(self.owned(model, self.alice), user))
+
+    def test_self_service_views(self):
+        own_leave = LeaveRequest.objects.get(employee=self.alice)
+        other_leave = LeaveRequest.objects.get(employee=self.bob)
+        own_payroll = Payroll.objects.get(employee=self.alice)
+        other_payroll = Payroll.objects.get(employee=self.bob)
+        for kind, claims in self.CLAIMS.items():
+            with self.subTest(kind=kind):
+                Payroll.objects.update(is_generating=False)
+                self.authenticate(self.alice.user, claims)
+                data = self.client.get("/api/leaves/").json()
+                rows = data["results"] if isinstance(data, dict) else data
+                self.assertEqual([row["id"] for row in rows], [own_leave.id])
+                self.assertEqual(self.client.get(f"/api/leaves/{own_leave.id}/").status_code, 200)
+                self.assertEqual(self.client.get(f"/api/leaves/{other_leave.id}/").status_code, 404)
+                self.assertEqual(self.client.post(f"/api/payrolls/{other_payroll.id}/generate_payslip/").status_code, 404)
+                self.assertEqual(self.client.post(f"/api/payrolls/{own_payroll.id}/generate_payslip/").status_code, 200)
+                self.assertEqual(self.client.get(f"/api/payrolls/{own_payroll.id}/").status_code, 403)
+
+
+class TodaySnapshotTests(HRMSTestCase):
+    def setUp(self):
+        super().setUp()
+        today_snapshot.invalidate()
+        self.today = get_current_date()
+        today_snapshot.get()
+
+    def counts(self, department):
+        with self.assertNumQueries(0):
+            payload = today_snapshot.get()
+        group, = [group for group in payload["departments"] if group["department"] == department]
+        return {key: value for key, value in group.items() if key in ("checked_in", "checked_out", "on_leave", "absent", "late")}
+
+    def at(self, hour):
+        return timezone.make_aware(timezone.datetime(self.today.year, self.today.month, self.today.day, hour))
+
+    def test_check_in_and_check_out(self):
+        self.assertEqual(self.counts("Engineering"), {"checked_in": 0, "checked_out": 0, "on_leave": 0, "absent": 1, "late": 0})
+        with self.captureOnCommitCallbacks(execute=True):
+            attendance = Attendance.objects.create(employee=self.alice, date=self.today, check_in=self.at(11), status="present")
+        self.assertEqual(self.counts("Engineering"), {"checked_in": 1, "checked_out": 0, "on_leave": 0, "absent": 0, "late": 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            attendance.check_out = self.at(18)
+            attendance.save()
+        self.assertEqual(self.counts("Engineering"), {"checked_in": 0, "checked_out": 1, "on_leave": 0, "absent": 0, "late": 1})
+        self.assertEqual(self.counts("Operations")["absent"], 1)
+
+    def test_leave_approval_and_rejection(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            leave = LeaveRequest.objects.create(
+                employee=self.bob, type="SICK", start_date=self.today, end_date=self.today + timedelta(days=1), reason="flu",
+            )
+        self.assertEqual(self.counts("Operations")["on_leave"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            leave.status = "APPROVED"
+            leave.save()
+        self.assertEqual(self.counts("Operations"), {"checked_in": 0, "checked_out": 0, "on_leave": 1, "absent": 0, "late": 0})
+        with self.captureOnCommitCallbacks(execute=True):
+            leave.status = "REJECTED"
+            leave.save()
+        # Another approved leave could still cover today, so this one reloads
+        with self.assertNumQueries(1):
+            today_snapshot.get()
+        self.assertEqual(self.counts("Operations"), {"checked_in": 0, "checked_out": 0, "on_leave": 0, "absent": 1, "late": 0})
+
+    def test_rejecting_pending_leave_needs_no_reload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            leave = LeaveRequest.objects.create(
+                employee=self.bob, type="SICK", start_date=self.today, end_date=self.today, reason="flu",
+            )
+            leave.status = "REJECTED"
+            leave.save()
+        self.assertEqual(self.counts("Operations")["absent"], 1)
+
+    def test_other_days_are_dropped(self):
+        yesterday = self.today - timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(employee=self.alice, date=yesterday, check_in=self.at(9) - timedelta(days=1), status="present")
+            LeaveRequest.objects.create(
+                employee=self.bob, type="SICK", start_date=yesterday, end_date=yesterday, reason="flu", status="APPROVED",
+            )
+        self.assertEqual(self.counts("Engineering")["absent"], 1)
+        self.assertEqual(self.counts("Operations")["absent"], 1)
+
+    def test_unknown_employee_forces_reload(self):
+        today_snapshot.attendance_changed(Attendance(employee_id=10 ** 6, date=self.today, check_in=self.at(9), status="present"))
+        with self.assertNumQueries(1):
+            today_snapshot.get()
+
+
+class RowEncoderTests(HRMSTestCase):
+    # The compiled encoders must render byte for byte what the serializers they replace do
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Attendance.objects.create(employee=cls.alice, date=date(2024, 1, 16), check_in=timezone.now(), status="late")
+        Attendance.objects.create(employee=cls.bob, date=date(2024, 1, 16), status="absent")
+        LeaveRequest.objects.filter(employee=cls.alice).update(status="APPROVED", action_by=cls.hr, is_paid=False)
+        Payroll.objects.filter(employee=cls.alice).update(
+            payslip_file="payslips/alice.docx", overtime_pay=Decimal("12.5"), status="PAID",
+            line_items={"base_salary": "1000.00", "paid_days": 20.5, "overtime_hours": 1.25},
+        )
+
+    def assertSameOutput(self, encoder, serializer_class, queryset):
+        request = Request(APIRequestFactory().get("/api/"))
+        renderer = FastJSONRenderer()
+        encoded = renderer.render(encoder.encode(queryset, request))
+        serialized = renderer.render(serializer_class(queryset, many=True, context={"request": request}).data)
+        self.assertEqual(encoded, serialized)
+
+    def test_attendance(self):
+        self.assertSameOutput(attendance_encoder, AttendanceSerializer, Attendance.objects.order_by("pk"))
+
+    def test_leave_requests(self):
+        self.assertSameOutput(leave_request_encoder, LeaveRequestSerializer, LeaveRequest.objects.order_by("pk"))
+
+    def test_payroll(self):
+        self.assertSameOutput(payroll_encoder, PayrollSerializer, Payroll.objects.order_by("pk"))
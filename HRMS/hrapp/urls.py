@@ -19,4 +19,12 @@ urlpatterns = [
     path("auth/logout/", UserLogoutView.as_view(), name="logout"),
     path("auth/refresh/", CookieTokenRefreshView.as_view(), name="refresh-token"),
     path("auth/verify-otp/", VerifyOTPView.as_view(), name="verify-otp"),
+    path("metrics/cache/", CacheMetricsView.as_view(), name="cache-metrics"),
+    path("metrics/tasks/", TaskMetricsView.as_view(), name="task-metrics"),
+    path("analytics/payroll-costs/", PayrollCostAnalyticsView.as_view(), name="payroll-cost-analytics"),
+    path("analytics/overtime/", OvertimeAnalyticsView.as_view(), name="overtime-analytics"),
+    path("analytics/lateness/", LatenessAnalyticsView.as_view(), name="lateness-analytics"),
+    path("analytics/absence/", AbsenceAnalyticsView.as_view(), name="absence-analytics"),
+    path("warehouse/<str:table>/", WarehouseExportView.as_view(), name="warehouse-export"),
+    path("events/", event_stream, name="event-stream"),
 ]
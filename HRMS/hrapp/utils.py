@@ -1,21 +1,21 @@
 from datetime import timedelta
 from decimal import Decimal
-from django.core.mail import send_mail
 from django.conf import settings
 from datetime import datetime, time
 from django.utils.timezone import get_current_timezone
-from .models import Attendance, Employee, LeaveRequest, Payroll, PayrollPeriod, get_work_hours
+from .models import Attendance, Employee, LeaveRequest, Payroll, PayrollLineItem, PayrollPeriod, get_work_hours
+from .outbox import queue_emails
 from django.db import transaction
 from datetime import datetime, timedelta
 
+def _otp_message(email, otp):
+    return (email, "Verify your account - OTP", f"Your OTP is {otp}. It expires in 5 minutes.")
+
 def send_otp_email(email, otp):
-    send_mail(
-        subject="Verify your account - OTP",
-        message=f"Your OTP is {otp}. It expires in 5 minutes.",
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[email],
-        fail_silently=False,
-    )
+    send_otp_emails([(email, otp)])
+
+def send_otp_emails(pairs):
+    return queue_emails(_otp_message(email, otp) for email, otp in pairs)
 
 def _daterange(start, end):
     while start <= end:
@@ -36,6 +36,8 @@ def generate_payroll_for_period(period_id, employee_id=None):
     
     payroll_rows = []
     tz = get_current_timezone()
+    work_hours = Decimal(str(get_work_hours()))
+    work_end = datetime.strptime(settings.COMPANY_CONFIG.get("work_hours", {}).get("end", "17:00"), "%H:%M").time()
 
     employees = Employee.objects.all()
     if employee_id:
@@ -58,16 +60,14 @@ def generate_payroll_for_period(period_id, employee_id=None):
                 if att.check_in and att.check_out:
                     hours = Decimal((att.check_out - att.check_in).total_seconds()) / Decimal(3600)
                 elif att.check_in and att.check_out is None:
-                    working_hours = settings.COMPANY_CONFIG.get("working_hours") or {}
-                    end_hour = working_hours.get("end", 17)
-                    assumed_checkout = datetime.combine(att.date, time(end_hour, 0), tzinfo=tz)
-                    hours = Decimal((assumed_checkout - att.check_in).total_seconds()) / Decimal(3600)
+                    assumed_checkout = datetime.combine(att.date, work_end, tzinfo=tz)
+                    hours = max(Decimal(0), Decimal((assumed_checkout - att.check_in).total_seconds()) / Decimal(3600))
                 else:
                     hours = Decimal("0.00")
 
                 total_hours += hours
-                if hours > get_work_hours():
-                    overtime_hours += (hours - get_work_hours())
+                if hours > work_hours:
+                    overtime_hours += hours - work_hours
 
                 paid_days += 1
             
@@ -90,6 +90,10 @@ def generate_payroll_for_period(period_id, employee_id=None):
         overtime_pay = (overtime_hours * overtime_rate).quantize(Decimal("0.01"))
         gross = base_pay + overtime_pay
         net = gross - deduction
+        line_item = PayrollLineItem(
+            base_salary=base_salary, daily_rate=daily_rate, paid_days=paid_days, unpaid_days=unpaid_days,
+            overtime_hours=overtime_hours.quantize(Decimal("0.0001")),
+        )
 
         payroll, created = Payroll.objects.update_or_create(
             employee=emp, period=period,
@@ -99,16 +103,13 @@ def generate_payroll_for_period(period_id, employee_id=None):
                 "deductions": deduction,
                 "net": net,
                 "currency": "INR",
-                "line_items": {
-                    "daily_rate": str(daily_rate),
-                    "paid_days": float(paid_days),
-                    "unpaid_days": float(unpaid_days),
-                    "overtime_hours": float(overtime_hours),
-                    "base_salary": str(base_salary),
-                },
+                "line_items": line_item.as_json(),
                 "status": "FINALIZED" if period.is_closed else "DRAFT",
             }
         )
+        PayrollLineItem.objects.update_or_create(
+            payroll=payroll, defaults={field: getattr(line_item, field) for field in PayrollLineItem.FIELDS},
+        )
         payroll_rows.append({"employee": emp.fullname, "gross": str(gross), "net": str(net)})
 
     return {
@@ -1,14 +1,26 @@
 from datetime import datetime, timedelta
+import hashlib
+import heapq
 from django.conf import settings
 from django.utils import timezone
-from django.http import FileResponse, Http404
+from django.utils.dateparse import parse_datetime
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from django.db import transaction
+from django.db.models import Count, Max
 from rest_framework import viewsets, permissions, views,status
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import CookieJWTAuthentication, add_identity_claims, get_employee_id
+from .revocation import is_revoked, revoke
 from .tasks import generate_payslip_background
+from .services import bulk_onboard_employees
 from .models import (
     Department, Employee, PaymentProfile, Attendance,
     LeaveRequest, LeaveBalance, PayrollPeriod, Payroll
@@ -19,13 +31,93 @@ from .serializers import (
     PaymentProfileSerializer, AttendanceSerializer,
     LeaveRequestSerializer, PayrollPeriodSerializer, PayrollSerializer,
     UserLoginSerializer, UserSerializer, UserSignupSerializer, VerifyOTPSerializer,
+    BulkOnboardSerializer,
 )
 
-from .permissions import RolePermission, IsOwnerOrRoleAllowed
+from .read_serializers import attendance_encoder, leave_request_encoder, payroll_encoder
+from .analytics import department_cost_report
+from .attendance_analytics import REPORTS as ATTENDANCE_REPORTS
+from .events import EventStream
+from .cache import bump_version, cache_metrics, cache_response, conditional_get, model_versions
+from .filters import ListFilter, date_range
+from .instrumentation import queue_metrics
+from .renderers import CSVRenderer, FastJSONRenderer, NDJSONRenderer
+from .permissions import RolePermission, IsOwnerOrRoleAllowed, is_owner, scope_to_owner
+from .retention import archived_attendance
+from .routers import ReplicaReadMixin
+from .snapshot import today_snapshot
+from . import warehouse
 from drf_yasg.utils import swagger_auto_schema
 
 User = get_user_model()
 
+
+class SparseFieldsMixin:
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.request.method == "GET" and getattr(self, "action", None) in ("list", "retrieve"):
+            serializer = self.get_serializer()
+            if getattr(serializer, "is_sparse", False):
+                qs = serializer.optimize_queryset(qs)
+        return qs
+
+
+class FastListMixin:
+    read_encoder = None
+    stream_chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        if self.read_encoder is None or self.paginator is not None or getattr(self.get_serializer(), "is_sparse", False):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        renderer = getattr(request, "accepted_renderer", None)
+        if request.query_params.get("stream") in ("1", "true") and hasattr(renderer, "iter_render"):
+            rows = self.read_encoder.iter_encode(queryset, request, chunk_size=self.stream_chunk_size)
+            return StreamingHttpResponse(renderer.iter_render(rows), content_type=renderer.media_type)
+        return Response(self.read_encoder.encode(queryset, request))
+
+
+class ETagMixin:
+    # The validator combines max(updated_at) and the row count of the scoped queryset with
+    # the versions of related tables whose columns appear in the payload.
+    etag_related_models = ()
+
+    def get_etag(self, request, pk=None):
+        queryset = self.filter_queryset(self.get_queryset())
+        if pk is not None:
+            queryset = queryset.filter(pk=pk)
+        state = queryset.aggregate(last=Max("updated_at"), count=Count("pk"))
+        raw = "|".join(str(part) for part in (
+            request.get_full_path(), request.user.pk, request.accepted_renderer.format,
+            state["last"], state["count"], model_versions(self.etag_related_models),
+        ))
+        return '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+
+class ExportMixin:
+    export_fields = ()
+    export_chunk_size = 2000
+
+    @action(detail=False, methods=["get"], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = self.read_encoder.iter_encode(queryset, request, chunk_size=self.export_chunk_size)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(renderer.iter_render(rows, list(self.export_fields)), content_type=renderer.media_type)
+        filename = f"{self.basename}-{timezone.localdate():%Y%m%d}.{renderer.format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Errors from export (401, 403, 400 from a filter) are JSON like every other endpoint,
+        # not a CSV of {"detail": ...}
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, "action", None) == "export" and isinstance(response, Response) and response.status_code >= 300:
+            response.accepted_renderer = FastJSONRenderer()
+            response.accepted_media_type = response.accepted_renderer.media_type
+        return response
+
+
 class UserSignupView(views.APIView):
     permission_classes = [permissions.AllowAny]
 
@@ -45,7 +137,7 @@ class UserLoginView(views.APIView):
         serializer = UserLoginSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.validated_data["user"]
-            refresh = RefreshToken.for_user(user)
+            refresh = add_identity_claims(RefreshToken.for_user(user), user)
             response = Response({"message":"Login successful","user":{"email":user.email,"role":user.role}}, status=status.HTTP_200_OK)
             response.set_cookie(
                 key="access_token", value=str(refresh.access_token), httponly=True,
@@ -59,7 +151,16 @@ class UserLoginView(views.APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class UserLogoutView(views.APIView):
+    # AllowAny so an expired access token does not stop the refresh token being revoked
+    permission_classes = [permissions.AllowAny]
+
     def post(self, request):
+        rt = request.COOKIES.get("refresh_token")
+        if rt:
+            try:
+                revoke(RefreshToken(rt))
+            except TokenError:
+                pass
         resp = Response({"message":"Logged out"})
         resp.delete_cookie("access_token")
         resp.delete_cookie("refresh_token")
@@ -73,14 +174,34 @@ class CookieTokenRefreshView(views.APIView):
             return Response({"error":"No refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
         try:
             refresh = RefreshToken(rt)
-            new_access = str(refresh.access_token)
+            if is_revoked(refresh):
+                return Response({"error":"Invalid or expired refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
+            # Role and employee link can change within the refresh token's lifetime, so the
+            # claims on each new token are re-read from the database.
+            user = User.objects.filter(pk=refresh[settings.SIMPLE_JWT["USER_ID_CLAIM"]], is_active=True).first()
+            if user is None:
+                return Response({"error":"Invalid or expired refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
+            rotate = settings.SIMPLE_JWT.get("ROTATE_REFRESH_TOKENS")
+            if rotate:
+                # A token that loses the race to be revoked was already rotated: treat it as reuse
+                if settings.SIMPLE_JWT.get("BLACKLIST_AFTER_ROTATION") and not revoke(refresh):
+                    return Response({"error":"Invalid or expired refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
+                refresh.set_jti()
+                refresh.set_exp()
+                refresh.set_iat()
+            add_identity_claims(refresh, user)
             response = Response({"message":"Token refreshed"})
             response.set_cookie(
-                key="access_token", value=new_access, httponly=True,
+                key="access_token", value=str(refresh.access_token), httponly=True,
                 secure=(not settings.DEBUG), samesite="Lax", max_age=15*60
             )
+            if rotate:
+                response.set_cookie(
+                    key="refresh_token", value=str(refresh), httponly=True,
+                    secure=(not settings.DEBUG), samesite="Lax", max_age=7*24*60*60
+                )
             return response
-        except Exception:
+        except TokenError:
             return Response({"error":"Invalid or expired refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
 
 class VerifyOTPView(views.APIView):
@@ -94,7 +215,9 @@ class VerifyOTPView(views.APIView):
             otp_obj = serializer.validated_data["otp_obj"]
 
             user.is_active = True
-            user.save(update_fields=["is_active"])
+            if serializer.validated_data.get("password"):
+                user.set_password(serializer.validated_data["password"])
+            user.save(update_fields=["is_active", "password"])
 
             otp_obj.is_used = True
             otp_obj.save(update_fields=["is_used"])
@@ -103,34 +226,51 @@ class VerifyOTPView(views.APIView):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class UserManageViewSet(viewsets.ReadOnlyModelViewSet):
+class UserManageViewSet(SparseFieldsMixin, viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated, RolePermission]
     allowed_roles = ["hr"]
 
+    @cache_response(User, per="role")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(User, per="role")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
-class DepartmentViewSet(viewsets.ModelViewSet):
+
+class DepartmentViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     allowed_roles = ["hr"]
     permission_classes = [permissions.IsAuthenticated, RolePermission]
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+    @cache_response(Department, per="role")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(Department, per="role")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+class EmployeeViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Employee.objects.select_related("user","department")
     serializer_class = EmployeeSerializer
     allowed_roles_by_action = {
         "list": ["hr"], "retrieve": ["hr"], "create": ["hr"], "destroy": ["hr"],
-        "approve": ["hr"], "payment_profile": ["hr"], 
+        "approve": ["hr"], "payment_profile": ["hr"], "bulk_onboard": ["hr"],
         
     }
     permission_classes = [permissions.IsAuthenticated, RolePermission]
 
     @action(detail=False, methods=["get","patch"], url_path="me")
+    @cache_response(Employee, User, Department)
     def me(self, request):
-        try:
-            emp = Employee.objects.get(user=request.user)
-        except Employee.DoesNotExist:
+        employee_id = get_employee_id(request.user)
+        emp = Employee.objects.select_related("user", "department").filter(pk=employee_id).first() if employee_id else None
+        if emp is None:
             return Response({"detail":"Employee profile missing"}, status=status.HTTP_404_NOT_FOUND)
 
         if request.method.lower() == "get":
@@ -145,6 +285,18 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             return Response(EmployeeSerializer(emp).data)
         return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @swagger_auto_schema(request_body=BulkOnboardSerializer)
+    @action(detail=False, methods=["post"])
+    def bulk_onboard(self, request):
+        ser = BulkOnboardSerializer(data=request.data)
+        if not ser.is_valid():
+            return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+        employees = bulk_onboard_employees(ser.validated_data["employees"])
+        return Response(
+            {"created": len(employees), "employees": [{"id": emp.id, "user_id": emp.user_id} for emp in employees]},
+            status=status.HTTP_201_CREATED,
+        )
+
     @action(detail=True, methods=["post"])
     def approve(self, request, pk=None):
         emp = self.get_object()
@@ -153,7 +305,7 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         emp.save(update_fields=["is_verified","pending_update"])
         return Response({"detail":"Employee profile verified"})
 
-class PaymentProfileViewSet(viewsets.ModelViewSet):
+class PaymentProfileViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = PaymentProfile.objects.select_related("employee","employee__user")
     serializer_class = PaymentProfileSerializer
     allowed_roles_by_action = {
@@ -163,53 +315,73 @@ class PaymentProfileViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, RolePermission]
 
     @action(detail=False, methods=["get"])
+    @cache_response(PaymentProfile, Employee)
     def mine(self, request):
-        try:
-            emp = Employee.objects.get(user=request.user)
-        except Employee.DoesNotExist:
+        employee_id = get_employee_id(request.user)
+        if employee_id is None:
             return Response({"detail":"Employee profile missing"}, status=status.HTTP_404_NOT_FOUND)
-        pp = getattr(emp, "payment_profile", None)
+        pp = PaymentProfile.objects.select_related("employee", "employee__user").filter(employee_id=employee_id).first()
         if not pp:
             return Response({"detail":"Payment profile missing"}, status=status.HTTP_404_NOT_FOUND)
         return Response(PaymentProfileSerializer(pp).data)
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(ReplicaReadMixin, ExportMixin, ETagMixin, FastListMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.select_related("employee","employee__user")
     serializer_class = AttendanceSerializer
+    replica_actions = ("list", "export", "history")
+    etag_related_models = (Employee,)
+    read_encoder = attendance_encoder
+    filter_backends = [ListFilter]
+    date_filter_field = "date"
+    filter_fields = ("employee_id", "status")
+    export_fields = (
+        "id", "employee_id", "employee.fullname", "date", "check_in", "check_out",
+        "status", "hours_worked", "overtime_hours",
+    )
     allowed_roles_by_action = {
         "list": ["hr"], "retrieve": ["hr"], "create": ["hr"], "update": ["hr"], "partial_update": ["hr"], "destroy": ["hr"],
-        "check_in": None, "check_out": None,"manual_checkout": ["hr"],
+        "check_in": None, "check_out": None,"manual_checkout": ["hr"], "export": ["hr"], "history": None,
+        "today": ["hr"],
     }
     permission_classes = [permissions.IsAuthenticated, RolePermission]
 
     def get_queryset(self):
         qs = super().get_queryset()
-        if getattr(self, "action", None) in ("list","retrieve"):
+        if getattr(self, "action", None) in ("list","retrieve","history"):
             if not (self.request.user.is_authenticated and self.request.user.role == "hr"):
-                qs = qs.filter(employee__user=self.request.user)
+                qs = scope_to_owner(qs, self.request.user)
         return qs
 
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=False, methods=["post"])
     def check_in(self, request):
         now = timezone.now()
         today = now.date()
         if request.user.role == "hr" and request.data.get("employee_id"):
-            employee = Employee.objects.filter(pk=request.data["employee_id"]).first()
-            if not employee:
+            employee_id = Employee.objects.filter(pk=request.data["employee_id"]).values_list("id", flat=True).first()
+            if not employee_id:
                 return Response({"detail":"Employee not found"}, status=status.HTTP_404_NOT_FOUND)
         else:
-            employee = Employee.objects.filter(user=request.user).first()
-            if not employee:
+            employee_id = get_employee_id(request.user)
+            if not employee_id:
                 return Response({"detail":"Employee profile missing"}, status=status.HTTP_400_BAD_REQUEST)
         att, created = Attendance.objects.get_or_create(
-            employee=employee, date=today,
+            employee_id=employee_id, date=today,
             defaults={"check_in": now, "status":"present"}
         )
         if not created and att.check_in:
             return Response({"detail":"Already checked in"}, status=status.HTTP_400_BAD_REQUEST)
-        att.check_in = now
-        if not att.status: att.status = "present"
-        att.save()
+        if not created:
+            att.check_in = now
+            if not att.status: att.status = "present"
+            att.save()
         return Response(self.get_serializer(att).data)
 
     @action(detail=False, methods=["post"])
@@ -217,15 +389,15 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         now = timezone.now()
         today = now.date()
         if request.user.role == "hr" and request.data.get("employee_id"):
-            employee = Employee.objects.filter(pk=request.data["employee_id"]).first()
-            if not employee:
+            employee_id = Employee.objects.filter(pk=request.data["employee_id"]).values_list("id", flat=True).first()
+            if not employee_id:
                 return Response({"detail":"Employee not found"}, status=status.HTTP_404_NOT_FOUND)
         else:
-            employee = Employee.objects.filter(user=request.user).first()
-            if not employee:
+            employee_id = get_employee_id(request.user)
+            if not employee_id:
                 return Response({"detail":"Employee profile missing"}, status=status.HTTP_400_BAD_REQUEST)
 
-        att = Attendance.objects.filter(employee=employee, date=today).first()
+        att = Attendance.objects.filter(employee_id=employee_id, date=today).first()
         if not att or not att.check_in:
             return Response({"detail":"No check-in record for today"}, status=status.HTTP_400_BAD_REQUEST)
         if att.check_out:
@@ -258,32 +430,83 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         attendance.save()
         return Response({"detail": "Checkout updated manually"} , status=status.HTTP_200_OK)
 
-class LeaveRequestViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=["get"])
+    def today(self, request):
+        # Counts per department from the in-process snapshot; ?employees=1 also lists who is in
+        # which state
+        return Response(today_snapshot.get(request.query_params.get("employees") in ("1", "true")))
+
+    @action(detail=False, methods=["get"])
+    def history(self, request):
+        # Live and archived attendance merged by date, in the list's format. Takes the list's
+        # from/to, employee_id and status filters.
+        live = self.filter_queryset(self.get_queryset()).order_by("date", "employee_id")
+        params = request.query_params
+        start, end = date_range(params)
+        row_status = params.get("status") or None
+        if request.user.role == "hr":
+            archived = archived_attendance(params.get("employee_id") or None, start, end, row_status, live.db)
+        else:
+            employee_id = get_employee_id(request.user)
+            if employee_id is not None and params.get("employee_id") in (None, "", str(employee_id)):
+                archived = archived_attendance(employee_id, start, end, row_status, live.db)
+            else:
+                archived = ()
+        rows = heapq.merge(
+            archived, live.values_list(*attendance_encoder.columns).iterator(chunk_size=self.stream_chunk_size),
+            key=lambda row: (row[3], row[1]),
+        )
+        ctx = attendance_encoder.context(request)
+        encoded = (attendance_encoder.encode_row(row, ctx) for row in rows)
+        renderer = getattr(request, "accepted_renderer", None)
+        if params.get("stream") in ("1", "true") and hasattr(renderer, "iter_render"):
+            return StreamingHttpResponse(renderer.iter_render(encoded), content_type=renderer.media_type)
+        return Response(list(encoded))
+
+class LeaveRequestViewSet(ReplicaReadMixin, ExportMixin, ETagMixin, FastListMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = LeaveRequest.objects.select_related("employee","action_by")
     serializer_class = LeaveRequestSerializer
+    replica_actions = ("list", "export")
+    etag_related_models = (Employee, User)
+    read_encoder = leave_request_encoder
+    filter_backends = [ListFilter]
+    date_filter_field = "start_date"
+    filter_fields = ("employee_id", "status", "type")
+    export_fields = (
+        "id", "employee.id", "employee.fullname", "type", "start_date", "end_date", "reason",
+        "status", "created_at", "action_by.id", "action_by.email", "is_paid", "days",
+    )
     allowed_roles_by_action = {
         "approve": ["hr"],
         "reject": ["hr"],
         "cancel": ["employee"],
+        "export": ["hr"],
     }
     permission_classes = [permissions.IsAuthenticated, RolePermission]
 
     def get_queryset(self):
         qs = super().get_queryset()
         if self.request.user.role != "hr":
-            qs = qs.filter(employee__user=self.request.user)
+            qs = scope_to_owner(qs, self.request.user)
         return qs
 
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
-        employee = Employee.objects.get(user=self.request.user)
-        serializer.save(employee=employee)
+        serializer.save(employee_id=get_employee_id(self.request.user))
     
     @transaction.atomic
     @action(detail=True, methods=["post"])
     def approve(self, request, pk=None):
         lr = self.get_object()
         lr.status = "APPROVED"
-        lr.action_by = request.user
+        lr.action_by_id = request.user.pk
         
         if lr.is_paid:
             lb, _ = LeaveBalance.objects.get_or_create(employee=lr.employee)
@@ -305,14 +528,14 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
     def reject(self, request, pk=None):
         lr = self.get_object()
         lr.status = "REJECTED"
-        lr.action_by = request.user
+        lr.action_by_id = request.user.pk
         lr.save()
         return Response(self.get_serializer(lr).data)
     
     @action(detail=True, methods=["post"])
     def cancel(self, request, pk=None):
         lr = self.get_object()
-        if lr.employee.user != request.user:
+        if not is_owner(lr, request.user):
             return Response({"detail": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
         if lr.status != "PENDING":
             return Response({"detail": "Only pending requests can be cancelled."}, status=status.HTTP_400_BAD_REQUEST)
@@ -320,38 +543,61 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
         lr.save()
         return Response(self.get_serializer(lr).data)
 
-class PayrollPeriodViewSet(viewsets.ModelViewSet):
+class PayrollPeriodViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = PayrollPeriod.objects.all()
     serializer_class = PayrollPeriodSerializer
     allowed_roles = ["hr"]
     permission_classes = [permissions.IsAuthenticated, RolePermission]
 
-class PayrollViewSet(viewsets.ReadOnlyModelViewSet):
+class PayrollViewSet(ReplicaReadMixin, ExportMixin, ETagMixin, FastListMixin, SparseFieldsMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Payroll.objects.select_related("employee","employee__user","period")
     serializer_class = PayrollSerializer
+    # The list is response-cached, so it fills from the primary
+    replica_actions = ("retrieve", "export")
+    etag_related_models = (Employee,)
+    read_encoder = payroll_encoder
+    filter_backends = [ListFilter]
+    date_filter_field = "period__start"
+    filter_fields = ("employee_id", "period_id", "status")
+    export_fields = (
+        "id", "employee_id", "employee.fullname", "period", "gross", "overtime_pay", "deductions", "net",
+        "currency", "line_items.base_salary", "line_items.daily_rate", "line_items.paid_days",
+        "line_items.unpaid_days", "line_items.overtime_hours", "payslip_file", "status", "generated_at",
+    )
 
     allowed_roles_by_action = {
         "list": ["hr"],
         "retrieve": ["hr"],
         "generate_payslip": ["hr", "employee"],
+        "export": ["hr"],
     }
     permission_classes = [permissions.IsAuthenticated, RolePermission, IsOwnerOrRoleAllowed]
 
     def get_queryset(self):
         qs = super().get_queryset()
         if self.request.user.role != "hr":
-            qs = qs.filter(employee__user=self.request.user)
+            qs = scope_to_owner(qs, self.request.user)
         return qs
-    
+
+    @conditional_get
+    @cache_response(Payroll, Employee, per="role")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=True, methods=["post"])
     def generate_payslip(self, request, pk=None):
         payroll = self.get_object()
 
-        if request.user.role != "hr" and payroll.employee.user != request.user:
+        if request.user.role != "hr" and not is_owner(payroll, request.user):
             return Response({"detail": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
-        updated = Payroll.objects.filter(id=payroll.id, is_generating=False).update(is_generating=True)
+        updated = Payroll.objects.filter(id=payroll.id, is_generating=False).update(is_generating=True, updated_at=timezone.now())
         if not updated:
             return Response({"detail": "Payslip is being generated. Please check later."}, status=status.HTTP_400_BAD_REQUEST)
+        bump_version(Payroll)
 
         generate_payslip_background(payroll.id)
 
@@ -363,3 +609,155 @@ class PayrollViewSet(viewsets.ReadOnlyModelViewSet):
             raise Http404("Payslip not ready.")
         return FileResponse(payroll.payslip_file.open("rb"), as_attachment=True,
                            filename=payroll.payslip_file.name.split("/")[-1])
+
+
+class CacheMetricsView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated, RolePermission]
+    allowed_roles = ["hr"]
+
+    def get(self, request):
+        return Response(cache_metrics())
+
+class TaskMetricsView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated, RolePermission]
+    allowed_roles = ["hr"]
+
+    def get(self, request):
+        try:
+            hours = max(1, min(int(request.query_params.get("hours", 24)), 24 * 30))
+        except ValueError:
+            return Response({"hours": ["Must be an integer."]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(queue_metrics(hours))
+
+class PayrollCostAnalyticsView(views.APIView):
+    # ?period_id= for one period, otherwise periods starting within ?from=&to= (default: the
+    # latest twelve)
+    permission_classes = [permissions.IsAuthenticated, RolePermission]
+    allowed_roles = ["hr"]
+
+    def get(self, request):
+        periods = PayrollPeriod.objects.order_by("start")
+        period_id = request.query_params.get("period_id")
+        if period_id:
+            if not period_id.isdigit():
+                return Response({"period_id": ["Must be an integer."]}, status=status.HTTP_400_BAD_REQUEST)
+            periods = periods.filter(pk=period_id)
+        else:
+            start, end = date_range(request.query_params)
+            if start:
+                periods = periods.filter(start__gte=start)
+            if end:
+                periods = periods.filter(start__lte=end)
+            if not (start or end):
+                periods = reversed(periods.reverse()[:12])
+        return Response({"periods": department_cost_report(periods)})
+
+
+class AttendanceAnalyticsView(views.APIView):
+    # ?from=&to= (default: the last 365 days) and ?department_id=
+    permission_classes = [permissions.IsAuthenticated, RolePermission]
+    allowed_roles = ["hr"]
+    report = None
+
+    def report_options(self, params):
+        return {}
+
+    def get(self, request):
+        params = request.query_params
+        start, end = date_range(params)
+        end = end or timezone.localdate()
+        start = start or end - timedelta(days=365)
+        department_id = params.get("department_id")
+        if department_id and not department_id.isdigit():
+            return Response({"department_id": ["Must be an integer."]}, status=status.HTTP_400_BAD_REQUEST)
+        result = ATTENDANCE_REPORTS[self.report](
+            start, end, int(department_id) if department_id else None, **self.report_options(params),
+        )
+        return Response({"from": start, "to": end, **result})
+
+
+class OvertimeAnalyticsView(AttendanceAnalyticsView):
+    report = "overtime"
+
+
+class LatenessAnalyticsView(AttendanceAnalyticsView):
+    # Also ?min_rate= (share of days late, default 0.25) and ?min_days= (default 3)
+    report = "lateness"
+
+    def report_options(self, params):
+        try:
+            min_rate = float(params.get("min_rate", 0.25))
+        except ValueError:
+            raise ValidationError({"min_rate": ["Must be a number."]})
+        try:
+            min_days = int(params.get("min_days", 3))
+        except ValueError:
+            raise ValidationError({"min_days": ["Must be an integer."]})
+        return {"min_rate": min(max(min_rate, 0.0), 1.0), "min_days": max(min_days, 1)}
+
+
+class AbsenceAnalyticsView(AttendanceAnalyticsView):
+    report = "absence"
+
+
+class WarehouseExportView(views.APIView):
+    # One Parquet file of the table, streamed while it is written. ?month=YYYY-MM for a single
+    # partition, ?since=<ISO datetime> for rows updated after it; X-Export-Until is the value to
+    # pass as since next time.
+    permission_classes = [permissions.IsAuthenticated, RolePermission]
+    allowed_roles = ["hr"]
+
+    def get(self, request, table):
+        if table not in warehouse.TABLES:
+            raise Http404
+        if warehouse.pa is None:
+            return Response({"detail": "Columnar exports need pyarrow."}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        until = timezone.now()
+        month = request.query_params.get("month")
+        if month:
+            try:
+                month = datetime.strptime(month, "%Y-%m").date()
+            except ValueError:
+                raise ValidationError({"month": ["Use YYYY-MM."]})
+        since = request.query_params.get("since")
+        if since:
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                since = None
+            if since is None:
+                raise ValidationError({"since": ["Use an ISO 8601 date and time."]})
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        rows = warehouse.changed_rows(table, since or None, month or None)
+        response = StreamingHttpResponse(warehouse.iter_parquet(table, rows), content_type=warehouse.PARQUET_MEDIA_TYPE)
+        filename = f"{table}-{month:%Y-%m}.parquet" if month else f"{table}-{until:%Y%m%dT%H%M%SZ}.parquet"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response["X-Export-Until"] = until.isoformat()
+        return response
+
+
+@require_GET
+async def event_stream(request):
+    # Server-sent events for HR dashboards: check_in, check_out, attendance(_deleted) and
+    # leave_status, optionally for one ?department_id=. Each client is a coroutine on the ASGI
+    # server's loop rather than a worker thread, so this needs HRMS.asgi; under WSGI it would
+    # never finish.
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "The event stream needs an ASGI server (HRMS.asgi)."}, status=501)
+    try:
+        authenticated = await sync_to_async(CookieJWTAuthentication().authenticate)(request)
+    except (InvalidToken, AuthenticationFailed):
+        authenticated = None
+    if authenticated is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+    if getattr(authenticated[0], "role", None) != "hr":
+        return JsonResponse({"detail": "You do not have permission to perform this action."}, status=403)
+    department_id = request.GET.get("department_id")
+    if department_id and not department_id.isdigit():
+        return JsonResponse({"department_id": ["Must be an integer."]}, status=400)
+    response = StreamingHttpResponse(EventStream(int(department_id) if department_id else None), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
@@ -0,0 +1,191 @@
+from datetime import timedelta
+from itertools import groupby, islice
+import json
+from pathlib import Path
+import shutil
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from .models import Attendance, ExportRun, LeaveRequest, Payroll
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+COMPRESSION = "zstd"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+# name: (model, date column the files are partitioned by month on, exported columns)
+TABLES = {
+    "attendance": (Attendance, "date", (
+        "id", "employee_id", "date", "check_in", "check_out", "status", "updated_at",
+    )),
+    "leave_requests": (LeaveRequest, "start_date", (
+        "id", "employee_id", "type", "start_date", "end_date", "reason", "status", "is_paid",
+        "action_by_id", "created_at", "updated_at",
+    )),
+    "payroll": (Payroll, "period__start", (
+        "id", "employee_id", "period_id", "period__start", "period__end", "gross", "overtime_pay",
+        "deductions", "net", "currency", "status", "line_item__base_salary", "line_item__daily_rate",
+        "line_item__paid_days", "line_item__unpaid_days", "line_item__overtime_hours",
+        "generated_at", "updated_at",
+    )),
+}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImproperlyConfigured("Columnar exports need pyarrow; install it with `pip install pyarrow`.")
+
+
+def _field(model, lookup):
+    *relations, name = lookup.split("__")
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    field = model._meta.get_field(name)
+    return field.target_field if field.is_relation else field
+
+
+def _arrow_type(field):
+    kind = field.get_internal_type()
+    if kind == "DecimalField":
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if kind == "DateTimeField":
+        return pa.timestamp("us", tz="UTC")
+    if kind == "DateField":
+        return pa.date32()
+    if kind == "BooleanField":
+        return pa.bool_()
+    if kind.endswith("IntegerField") or kind.endswith("AutoField"):
+        return pa.int64()
+    return pa.string()
+
+
+def schema(name):
+    _require_pyarrow()
+    model, _, columns = TABLES[name]
+    return pa.schema([(column.replace("__", "_"), _arrow_type(_field(model, column))) for column in columns])
+
+
+def changed_rows(name, since=None, month=None):
+    # Rows ordered by their partition month; since= keeps rows updated after it, month= (the
+    # first of a month) keeps a single partition
+    model, month_column, _ = TABLES[name]
+    queryset = model.objects.order_by(month_column, "pk")
+    if since is not None:
+        queryset = queryset.filter(updated_at__gt=since)
+    if month is not None:
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        queryset = queryset.filter(**{f"{month_column}__gte": month, f"{month_column}__lt": next_month})
+    return queryset
+
+
+def iter_batches(name, queryset, chunk_size=None):
+    # (month, RecordBatch) pairs in month order, read chunk_size rows at a time from a chunked
+    # cursor so memory stays bounded whatever the table size
+    chunk_size = chunk_size or settings.WAREHOUSE_EXPORT_CHUNK_SIZE
+    table_schema = schema(name)
+    _, month_column, columns = TABLES[name]
+    position = columns.index(month_column)
+    rows = queryset.values_list(*columns).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        for month, group in groupby(chunk, key=lambda row: row[position].replace(day=1)):
+            group = list(group)
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*group), table_schema)]
+            yield month, pa.record_batch(arrays, schema=table_schema)
+
+
+def write_partitions(name, queryset, directory, chunk_size=None):
+    # Writes month=YYYY-MM/data.parquet files under directory; rows arrive in month order so
+    # only one file is open at a time. Returns {month: rows}.
+    counts, writer, current = {}, None, None
+    try:
+        for month, batch in iter_batches(name, queryset, chunk_size):
+            if month != current:
+                if writer is not None:
+                    writer.close()
+                path = Path(directory) / f"month={month:%Y-%m}" / "data.parquet"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                writer, current = pq.ParquetWriter(path, batch.schema, compression=COMPRESSION), month
+            writer.write_batch(batch)
+            counts[month] = counts.get(month, 0) + batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return counts
+
+
+def export(name, root=None, incremental=False, chunk_size=None):
+    # Writes a full snapshot of the table, or with incremental=True the rows updated since the
+    # previous run, into its own directory under root/name. The directory only appears (with
+    # its _manifest.json, which dataset readers skip) once every file is complete.
+    _require_pyarrow()
+    until = timezone.now()
+    previous = ExportRun.objects.filter(table=name).order_by("-until").first() if incremental else None
+    since = previous.until - timedelta(seconds=settings.WAREHOUSE_EXPORT_OVERLAP_SECONDS) if previous else None
+    root = Path(root or settings.WAREHOUSE_EXPORT_DIR) / name
+    target = root / f"{'changes' if since else 'full'}-{until:%Y%m%dT%H%M%SZ}"
+    staging = root / f".{target.name}"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    try:
+        counts = write_partitions(name, changed_rows(name, since), staging, chunk_size)
+        manifest = {
+            "table": name,
+            "mode": "incremental" if since else "full",
+            "since": since and since.isoformat(),
+            "until": until.isoformat(),
+            "rows": sum(counts.values()),
+            "partitions": {f"{month:%Y-%m}": rows for month, rows in sorted(counts.items())},
+        }
+        (staging / "_manifest.json").write_text(json.dumps(manifest, indent=2))
+        staging.rename(target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return ExportRun.objects.create(table=name, since=since, until=until, rows=manifest["rows"], path=str(target))
+
+
+class _Sink:
+    # Write-only file object that hands back whatever was written since the last drain()
+    closed = False
+
+    def __init__(self):
+        self.chunks, self.position = [], 0
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_parquet(name, queryset, chunk_size=None):
+    # One Parquet file streamed as it is written, a row group for each month of each chunk
+    _require_pyarrow()
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema(name), compression=COMPRESSION)
+    for _, batch in iter_batches(name, queryset, chunk_size):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
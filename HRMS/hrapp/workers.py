@@ -0,0 +1,129 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import django
+from background_task.models import Task
+from background_task.settings import app_settings
+from background_task.tasks import autodiscover, tasks
+from django.db import close_old_connections, connections
+from django.utils import timezone
+from .instrumentation import instrument
+
+DEFAULT_QUEUE = "default"
+logger = logging.getLogger(__name__)
+
+
+def execute_task(task_id, worker_name=""):
+    # Runs in a pool thread or process. Completion, repetition and retries are handled by
+    # django-background-tasks itself; the lease was taken by the dispatcher.
+    try:
+        task = Task.objects.filter(pk=task_id).first()
+        if task is not None:
+            with instrument(task, worker_name):
+                tasks.run_task(task)
+    finally:
+        connections.close_all()
+
+
+class QueueWorker:
+    # Serves one queue with a fixed number of slots. Tasks are claimed with a conditional
+    # UPDATE of locked_by/locked_at, so any number of worker processes can share the table;
+    # the lease is kept alive by heartbeat() and lapses after MAX_RUN_TIME if we die.
+    def __init__(self, queue, workers=1, pool="thread", worker_name=None):
+        self.queue = queue
+        self.slots = workers
+        self.worker_name = worker_name or str(os.getpid())
+        self.in_flight = {}
+        self._lock = threading.Lock()
+        if pool == "process":
+            # Spawned rather than forked because the dispatcher is multi-threaded
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=django.setup,
+            )
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"tasks-{queue}")
+
+    def _ready(self, now):
+        qs = Task.objects.unlocked(now).filter(run_at__lte=now, failed_at=None, task_name__in=list(tasks._tasks))
+        qs = qs.filter(queue__isnull=True) if self.queue == DEFAULT_QUEUE else qs.filter(queue=self.queue)
+        return qs.order_by(f"{app_settings.BACKGROUND_TASK_PRIORITY_ORDERING}priority", "run_at")
+
+    def claim(self, limit):
+        now = timezone.now()
+        claimed = []
+        for pk in self._ready(now).values_list("pk", flat=True)[:limit * 2]:
+            if Task.objects.unlocked(now).filter(pk=pk).update(locked_by=self.worker_name, locked_at=now):
+                claimed.append(pk)
+                if len(claimed) == limit:
+                    break
+        return claimed
+
+    def fill(self):
+        with self._lock:
+            free = self.slots - len(self.in_flight)
+        if free <= 0:
+            return 0
+        claimed = self.claim(free)
+        for pk in claimed:
+            future = self.executor.submit(execute_task, pk, self.worker_name)
+            with self._lock:
+                self.in_flight[pk] = time.monotonic()
+            future.add_done_callback(lambda f, pk=pk: self._done(pk, f))
+        return len(claimed)
+
+    def _done(self, pk, future):
+        with self._lock:
+            started = self.in_flight.pop(pk, None)
+        error = future.exception()
+        if error is not None:
+            logger.exception("[%s] task %s crashed the worker", self.queue, pk, exc_info=error)
+        elif started is not None:
+            logger.info("[%s] task %s finished in %.2fs", self.queue, pk, time.monotonic() - started)
+
+    def heartbeat(self):
+        with self._lock:
+            running = list(self.in_flight)
+        if running:
+            Task.objects.filter(pk__in=running, locked_by=self.worker_name).update(locked_at=timezone.now())
+        return running
+
+    def busy(self):
+        with self._lock:
+            return bool(self.in_flight)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class WorkerPool:
+    def __init__(self, queues, worker_name=None):
+        autodiscover()
+        self.worker_name = worker_name or str(os.getpid())
+        self.workers = [QueueWorker(name, worker_name=self.worker_name, **options) for name, options in queues.items()]
+        self.stopping = False
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self, poll=1.0, heartbeat=30.0, burst=False):
+        # burst: exit once every queue is empty and nothing is running
+        last_beat = time.monotonic()
+        while True:
+            claimed = 0
+            if not self.stopping:
+                claimed = sum(worker.fill() for worker in self.workers)
+            if time.monotonic() - last_beat >= heartbeat:
+                for worker in self.workers:
+                    worker.heartbeat()
+                last_beat = time.monotonic()
+            busy = any(worker.busy() for worker in self.workers)
+            if (self.stopping or (burst and not claimed)) and not busy:
+                break
+            close_old_connections()
+            if not claimed:
+                time.sleep(poll)
+        for worker in self.workers:
+            worker.shutdown()